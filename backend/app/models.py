@@ -4,34 +4,48 @@ Database models for the Pair Programming application.
 This module defines SQLAlchemy ORM models for rooms and code snapshots.
 """
 
-from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, Boolean, LargeBinary, Index, func
 from sqlalchemy.orm import relationship
-from datetime import datetime
 from app.database import Base
-import uuid
+
+# Room IDs are short share codes generated by RoomService
+ROOM_ID_LENGTH = 8
 
 class Room(Base):
     """
     Room model representing a collaborative coding session.
     
     Attributes:
-        id: Unique room identifier (UUID)
+        id: Unique room identifier (short share code)
         code: Current code content in the room
         language: Programming language (default: python)
+        version: Number of edits made to the code through the WebSocket
         created_at: Timestamp when room was created
         updated_at: Timestamp when room was last updated
         snapshots: Relationship to code snapshots
     """
     __tablename__ = "rooms"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Fetch server-generated timestamps in the INSERT (RETURNING) rather than
+    # needing a refresh afterwards
+    __mapper_args__ = {"eager_defaults": True}
+    
+    id = Column(String(ROOM_ID_LENGTH), primary_key=True)
     code = Column(Text, default="# Write your Python code here\n\n")
     language = Column(String, default="python")
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    # Relationship to snapshots (for history tracking if needed)
-    snapshots = relationship("CodeSnapshot", back_populates="room", cascade="all, delete-orphan")
+    # Relationship to snapshots (for history tracking if needed), newest first.
+    # Lazy loads raise: load with selectinload or use RoomService.list_snapshots
+    snapshots = relationship(
+        "CodeSnapshot",
+        back_populates="room",
+        cascade="all, delete-orphan",
+        lazy="raise",
+        order_by="(CodeSnapshot.timestamp.desc(), CodeSnapshot.id.desc())"
+    )
     
     def __repr__(self):
         return f"<Room(id={self.id}, language={self.language})>"
@@ -46,20 +60,32 @@ class CodeSnapshot(Base):
     - History viewing
     - Time-travel debugging
     
+    Most snapshots store only a delta against an earlier snapshot, with a
+    full copy stored periodically; large payloads are compressed. Use
+    SnapshotService.get_code to read the code of any snapshot.
+    
     Attributes:
         id: Unique snapshot identifier
         room_id: Foreign key to room
-        code: Code content at this snapshot
+        is_full: Whether this snapshot stores the full code
+        base_id: Snapshot the delta applies to (delta snapshots only)
+        payload: Encoded full code, or change from the base snapshot
         timestamp: When this snapshot was created
         user_identifier: Optional identifier for who made the change
         room: Relationship back to room
     """
     __tablename__ = "code_snapshots"
+    __table_args__ = (
+        # Serves per-room lookups, cascade deletes and latest-N history queries
+        Index("ix_code_snapshots_room_id_timestamp", "room_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    room_id = Column(String, ForeignKey("rooms.id"), nullable=False)
-    code = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    room_id = Column(String(ROOM_ID_LENGTH), ForeignKey("rooms.id"), nullable=False)
+    is_full = Column(Boolean, nullable=False, default=True)
+    base_id = Column(Integer, nullable=True)  # code_snapshots.id; no FK so room deletes need no ordering
+    payload = Column(LargeBinary, nullable=False)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
     user_identifier = Column(String, nullable=True)  # Optional: track which user made change
     
     # Relationship to room
@@ -6,10 +6,13 @@ Currently implements mock suggestions, but designed to be easily replaced
 with real AI models (e.g., GPT, Codex, or local models).
 """
 
-from fastapi import APIRouter, HTTPException, status
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import APIRouter, HTTPException, Response, status
 from app.schemas import AutocompleteRequest, AutocompleteResponse
 from app.services.autocomplete_service import AutocompleteService
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +21,58 @@ router = APIRouter()
 # Initialize autocomplete service
 autocomplete_service = AutocompleteService()
 
+# Worker processes for generating suggestions. The rule-based service is
+# faster inline than a round trip to another process, so this defaults to
+# 0 (run in the event loop); set it when backed by a CPU-heavy model.
+AUTOCOMPLETE_WORKERS = int(os.getenv("AUTOCOMPLETE_WORKERS", "0"))
+
+executor: ProcessPoolExecutor | None = None
+
+
+def start_executor():
+    """Start the suggestion worker processes if AUTOCOMPLETE_WORKERS is set."""
+    global executor
+    if AUTOCOMPLETE_WORKERS > 0 and executor is None:
+        executor = ProcessPoolExecutor(max_workers=AUTOCOMPLETE_WORKERS)
+        logger.info(f"Started {AUTOCOMPLETE_WORKERS} autocomplete worker processes")
+
+
+def shutdown_executor():
+    """Stop the suggestion worker processes."""
+    global executor
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+        executor = None
+
+
+async def generate_suggestion(code: str, cursor_position: int, language: str) -> AutocompleteResponse:
+    """
+    Generate a suggestion, in a worker process if the executor is running.
+    
+    Keeps slow suggestion backends from blocking other HTTP and WebSocket
+    traffic on the event loop.
+    
+    Args:
+        code: Current code content
+        cursor_position: Cursor position in code
+        language: Programming language
+        
+    Returns:
+        AutocompleteResponse: Generated suggestion
+    """
+    if executor is None:
+        return autocomplete_service.generate_suggestion(code, cursor_position, language)
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        autocomplete_service.generate_suggestion,
+        code,
+        cursor_position,
+        language
+    )
+
+
 @router.post("", response_model=AutocompleteResponse)
 async def get_autocomplete_suggestion(request: AutocompleteRequest):
     """
@@ -60,7 +115,7 @@ async def get_autocomplete_suggestion(request: AutocompleteRequest):
             )
         
         # Generate suggestion using service
-        suggestion = autocomplete_service.generate_suggestion(
+        suggestion = await generate_suggestion(
             code=request.code,
             cursor_position=request.cursorPosition,
             language=request.language
@@ -70,7 +125,11 @@ async def get_autocomplete_suggestion(request: AutocompleteRequest):
             f"Generated suggestion for {request.language} at position {request.cursorPosition}"
         )
         
-        return suggestion
+        # Serialize in pydantic-core; the suggestion is already validated
+        return Response(
+            content=suggestion.model_dump_json(),
+            media_type="application/json"
+        )
         
     except HTTPException:
         raise
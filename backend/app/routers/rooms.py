@@ -7,22 +7,66 @@ This module provides endpoints for:
 - Managing room state
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Room
 from app.schemas import RoomCreate, RoomResponse
 from app.services.room_service import RoomService
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+def room_etag(room: Room) -> str:
+    """
+    Compute a weak ETag for a room's current state.
+    
+    Combines the update time with a checksum of the code and language,
+    since some databases (e.g. SQLite) only store timestamps to the second.
+    The language is user-supplied, so it only enters the tag via the checksum.
+    
+    Args:
+        room: Room instance
+        
+    Returns:
+        str: ETag header value
+    """
+    updated = room.updated_at.timestamp() if room.updated_at else 0
+    checksum = zlib.crc32((room.language or "").encode(), zlib.crc32((room.code or "").encode()))
+    return f'W/"{updated:.6f}-{checksum:08x}"'
+
+
+def room_response(room: Room, status_code: int = status.HTTP_200_OK, headers: dict | None = None) -> Response:
+    """
+    Serialize a room straight from its ORM attributes.
+    
+    Validation and JSON encoding both run in pydantic-core, and returning a
+    Response skips FastAPI's second response_model validation pass.
+    
+    Args:
+        room: Room instance
+        status_code: HTTP status code for the response
+        headers: Optional extra response headers
+        
+    Returns:
+        Response: JSON response with RoomResponse body
+    """
+    return Response(
+        content=RoomResponse.model_validate(room).model_dump_json(),
+        media_type="application/json",
+        status_code=status_code,
+        headers=headers
+    )
+
+
 @router.post("", response_model=RoomResponse, status_code=status.HTTP_201_CREATED)
 async def create_room(
     room_data: RoomCreate = RoomCreate(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new collaborative coding room.
@@ -50,16 +94,11 @@ async def create_room(
     """
     try:
         room_service = RoomService(db)
-        room = room_service.create_room(language=room_data.language)
+        room = await room_service.create_room(language=room_data.language)
         
         logger.info(f"Room created successfully: {room.id}")
         
-        return RoomResponse(
-            roomId=room.id,
-            code=room.code,
-            language=room.language,
-            created_at=room.created_at
-        )
+        return room_response(room, status_code=status.HTTP_201_CREATED)
     except Exception as e:
         logger.error(f"Error creating room: {str(e)}")
         raise HTTPException(
@@ -71,13 +110,18 @@ async def create_room(
 @router.get("/{room_id}", response_model=RoomResponse)
 async def get_room(
     room_id: str,
-    db: Session = Depends(get_db)
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve room information by room ID.
     
+    Responses carry an ETag; a request whose If-None-Match matches the
+    room's current ETag gets 304 Not Modified with no body.
+    
     Args:
         room_id: Unique room identifier
+        if_none_match: ETag(s) from a previous response
         db: Database session dependency
         
     Returns:
@@ -99,7 +143,7 @@ async def get_room(
     """
     try:
         room_service = RoomService(db)
-        room = room_service.get_room(room_id)
+        room = await room_service.get_room(room_id)
         
         if not room:
             raise HTTPException(
@@ -107,12 +151,17 @@ async def get_room(
                 detail=f"Room {room_id} not found"
             )
         
-        return RoomResponse(
-            roomId=room.id,
-            code=room.code,
-            language=room.language,
-            created_at=room.created_at
-        )
+        etag = room_etag(room)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, max-age=0, must-revalidate"
+        }
+        
+        # Client already has this version: skip serializing the room
+        if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        return room_response(room, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -126,7 +175,7 @@ async def get_room(
 @router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_room(
     room_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a room and all its associated data.
@@ -143,7 +192,7 @@ async def delete_room(
     """
     try:
         room_service = RoomService(db)
-        success = room_service.delete_room(room_id)
+        success = await room_service.delete_room(room_id)
         
         if not success:
             raise HTTPException(
@@ -6,25 +6,55 @@ between multiple users in the same room.
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal, get_db
 from app.services.websocket_manager import WebSocketManager
 from app.services.room_service import RoomService
+from typing import Dict
 import logging
-import json
+import orjson
+import os
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+async def save_room_codes(codes: Dict[str, str], versions: Dict[str, int]):
+    """
+    Persist a batch of buffered room code using a short-lived database session.
+    
+    Args:
+        codes: Latest code content per room ID
+        versions: Version of that code per room ID
+    """
+    async with SessionLocal() as db:
+        await RoomService(db).update_rooms_code(codes, versions=versions)
+
+
+def create_redis():
+    """
+    Create a Redis client for cross-worker broadcasting if REDIS_URL is set.
+    
+    Returns:
+        Redis client, or None to broadcast within this process only
+    """
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return None
+    
+    from redis.asyncio import Redis
+    return Redis.from_url(redis_url)
+
+
 # Initialize WebSocket manager (singleton pattern)
-ws_manager = WebSocketManager()
+ws_manager = WebSocketManager(persist_code=save_room_codes, redis=create_redis())
 
 @router.websocket("/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     room_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     WebSocket endpoint for real-time collaborative editing.
@@ -32,38 +62,88 @@ async def websocket_endpoint(
     This endpoint:
     1. Accepts WebSocket connections for a specific room
     2. Adds the connection to the room's connection pool
-    3. Broadcasts code changes to all connected clients
-    4. Handles disconnections gracefully
+    3. Applies edits to the room's code and broadcasts them to other clients
+    4. Buffers code changes and saves them at most every CODE_FLUSH_DELAY
+    5. Handles disconnections gracefully
     
     Args:
         websocket: WebSocket connection
         room_id: Unique room identifier
-        db: Database session dependency
+        db: Database session dependency, used only to look up the room
         
     Message Format (Client -> Server):
         {
             "type": "code_update",
             "code": "print('Hello, World!')"
         }
+        OR, to send only the edit (see apply_ops):
+        {
+            "type": "op",
+            "version": 3,
+            "ops": [{"retain": 7}, {"delete": 5}, {"insert": "World"}]
+        }
         
     Message Format (Server -> Client):
+        On connect, everything needed to open the editor:
+        {
+            "type": "init",
+            "code": "print('Hello, World!')",
+            "language": "python",
+            "version": 4,
+            "user_count": 2
+        }
+        Then:
         {
             "type": "code_update",
-            "code": "print('Hello, World!')"
+            "code": "print('Hello, World!')",
+            "version": 4
+        }
+        OR
+        {
+            "type": "op",
+            "version": 4,
+            "ops": [{"retain": 7}, {"delete": 5}, {"insert": "World"}]
+        }
+        OR
+        {
+            "type": "ack",
+            "version": 4
         }
         OR
         {
             "type": "user_count",
             "count": 2
         }
+        OR, when several messages are sent within BROADCAST_INTERVAL:
+        {
+            "type": "batch",
+            "events": [{"type": "op", ...}, {"type": "user_count", ...}]
+        }
+        
+    "version" counts accepted edits to the room. Ops are only applied if
+    made against the current version; otherwise the sender is sent the
+    current code as a code_update to resync. Accepted ops are acknowledged
+    to the sender with an ack carrying the new version. With REDIS_URL set,
+    versions are shared by all workers serving the room. A resync is sent
+    immediately and can overtake broadcasts still waiting to be batched, so
+    clients ignore any op or code_update whose version isn't newer than
+    their own.
         
     Example Usage (JavaScript):
         const ws = new WebSocket('ws://localhost:8000/ws/abc123');
+        let version = 0;
         
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
-            if (data.type === 'code_update') {
-                editor.setValue(data.code);
+            const events = data.type === 'batch' ? data.events : [data];
+            for (const event of events) {
+                if (event.type === 'init') {
+                    editor.setValue(event.code);
+                    version = event.version;
+                } else if (event.type === 'code_update' && event.version > version) {
+                    editor.setValue(event.code);
+                    version = event.version;
+                }
             }
         };
         
@@ -74,7 +154,11 @@ async def websocket_endpoint(
     """
     # Verify room exists
     room_service = RoomService(db)
-    room = room_service.get_room(room_id)
+    room = await room_service.get_room(room_id)
+    
+    # Writes use their own sessions; return the connection to the pool now
+    # rather than holding it open for the lifetime of the WebSocket
+    await db.close()
     
     if not room:
         await websocket.close(code=4004, reason="Room not found")
@@ -83,17 +167,23 @@ async def websocket_endpoint(
     
     # Accept WebSocket connection
     await ws_manager.connect(websocket, room_id)
-    logger.info(f"Client connected to room {room_id}. Total connections: {ws_manager.get_connection_count(room_id)}")
+    logger.debug("Client connected to room %s", room_id)
     
-    # Send current room code to the new connection
+    # Send the room's state to the new connection in one frame, so the
+    # client needs no separate request before the editor is usable
     try:
-        await websocket.send_json({
-            "type": "code_update",
-            "code": room.code
-        })
+        code, version = await ws_manager.open_document(room_id, room.code, room.version)
         
-        # Broadcast updated user count
-        await ws_manager.broadcast_user_count(room_id)
+        await websocket.send_text(orjson.dumps({
+            "type": "init",
+            "code": code,
+            "language": room.language,
+            "version": version,
+            "user_count": ws_manager.get_connection_count(room_id)
+        }).decode())
+        
+        # Broadcast updated user count to everyone else
+        await ws_manager.broadcast_user_count(room_id, exclude=websocket)
         
     except Exception as e:
         logger.error(f"Error sending initial data: {str(e)}")
@@ -102,34 +192,80 @@ async def websocket_endpoint(
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = orjson.loads(data)
             
             # Handle different message types
             if message.get("type") == "code_update":
                 code = message.get("code", "")
                 
-                # Update room code in database
-                room_service.update_room_code(room_id, code)
+                if isinstance(code, str):
+                    # Buffer the update; it is saved to the database shortly
+                    version = await ws_manager.queue_code_update(room_id, code)
+                else:
+                    logger.warning(f"Rejected code_update in room {room_id}: code is not a string")
+                    version = None
+                
+                if version is None:
+                    # Invalid, or couldn't be shared with other workers: send the current code
+                    code, version = await ws_manager.open_document(room_id, room.code, room.version)
+                    await ws_manager.send_to_user(websocket, {
+                        "type": "code_update",
+                        "code": code,
+                        "version": version
+                    })
+                    continue
                 
                 # Broadcast to all clients in the room (except sender)
                 await ws_manager.broadcast(
                     room_id,
                     {
                         "type": "code_update",
-                        "code": code
+                        "code": code,
+                        "version": version
+                    },
+                    exclude=websocket
+                )
+                
+                logger.debug("Code updated in room %s", room_id)
+            
+            elif message.get("type") == "op":
+                ops = message.get("ops", [])
+                
+                try:
+                    version = await ws_manager.apply_ops(room_id, ops, message.get("version"))
+                except ValueError as e:
+                    logger.warning(f"Rejected op in room {room_id}: {str(e)}")
+                    version = None
+                
+                if version is None:
+                    # Stale or invalid op: send the sender the current code
+                    code, version = await ws_manager.open_document(room_id, room.code, room.version)
+                    await ws_manager.send_to_user(websocket, {
+                        "type": "code_update",
+                        "code": code,
+                        "version": version
+                    })
+                    continue
+                
+                await ws_manager.send_to_user(websocket, {"type": "ack", "version": version})
+                
+                # Other clients apply the same ops
+                await ws_manager.broadcast(
+                    room_id,
+                    {
+                        "type": "op",
+                        "version": version,
+                        "ops": ops
                     },
                     exclude=websocket
                 )
                 
-                logger.debug(f"Code updated in room {room_id}")
+                logger.debug("Ops applied in room %s (version %d)", room_id, version)
             
     except WebSocketDisconnect:
         # Handle disconnection
         ws_manager.disconnect(websocket, room_id)
-        logger.info(
-            f"Client disconnected from room {room_id}. "
-            f"Remaining connections: {ws_manager.get_connection_count(room_id)}"
-        )
+        logger.debug("Client disconnected from room %s", room_id)
         
         # Broadcast updated user count
         await ws_manager.broadcast_user_count(room_id)
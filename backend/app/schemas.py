@@ -5,9 +5,9 @@ These schemas define the structure of data exchanged between
 client and server, providing automatic validation and serialization.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class RoomCreate(BaseModel):
     """Schema for creating a new room (no input needed)"""
@@ -23,13 +23,17 @@ class RoomResponse(BaseModel):
         language: Programming language
         created_at: Timestamp when room was created
     """
-    roomId: str = Field(..., description="Unique room identifier")
+    # Build directly from a Room ORM instance (its id attribute maps to roomId)
+    model_config = ConfigDict(from_attributes=True)
+    
+    roomId: str = Field(
+        ...,
+        validation_alias=AliasChoices("roomId", "id"),
+        description="Unique room identifier"
+    )
     code: str = Field(..., description="Initial code content")
     language: str = Field(..., description="Programming language")
     created_at: datetime = Field(..., description="Room creation timestamp")
-    
-    class Config:
-        from_attributes = True
 
 
 class AutocompleteRequest(BaseModel):
@@ -41,18 +45,17 @@ class AutocompleteRequest(BaseModel):
         cursorPosition: Current cursor position in the code
         language: Programming language for context
     """
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "code": "def hello():\n    print(",
+            "cursorPosition": 25,
+            "language": "python"
+        }
+    })
+    
     code: str = Field(..., description="Current code content")
     cursorPosition: int = Field(..., ge=0, description="Cursor position in code")
     language: str = Field(default="python", description="Programming language")
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "code": "def hello():\n    print(",
-                "cursorPosition": 25,
-                "language": "python"
-            }
-        }
 
 
 class AutocompleteResponse(BaseModel):
@@ -64,18 +67,17 @@ class AutocompleteResponse(BaseModel):
         confidence: Confidence score (0.0 to 1.0)
         type: Type of suggestion (completion, import, etc.)
     """
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "suggestion": "\"Hello, World!\")",
+            "confidence": 0.85,
+            "type": "completion"
+        }
+    })
+    
     suggestion: str = Field(..., description="Code suggestion")
     confidence: float = Field(default=0.8, ge=0.0, le=1.0, description="Confidence score")
     type: str = Field(default="completion", description="Suggestion type")
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "suggestion": "\"Hello, World!\")",
-                "confidence": 0.85,
-                "type": "completion"
-            }
-        }
 
 
 class WebSocketMessage(BaseModel):
@@ -83,21 +85,24 @@ class WebSocketMessage(BaseModel):
     Schema for WebSocket messages.
     
     Attributes:
-        type: Message type (code_update, user_join, user_leave, etc.)
+        type: Message type (code_update, op, ack, user_count, etc.)
         code: Code content (for code_update messages)
+        ops: Text operations (for op messages)
+        version: Version of the room's code the message applies to
         user_id: User identifier (optional)
         timestamp: Message timestamp
     """
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "type": "code_update",
+            "code": "print('Hello, World!')",
+            "timestamp": "2025-01-15T10:30:00Z"
+        }
+    })
+    
     type: str = Field(..., description="Message type")
     code: Optional[str] = Field(None, description="Code content")
+    ops: Optional[List[Dict[str, Any]]] = Field(None, description="Text operations")
+    version: Optional[int] = Field(None, description="Code version")
     user_id: Optional[str] = Field(None, description="User identifier")
-    timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow)
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "type": "code_update",
-                "code": "print('Hello, World!')",
-                "timestamp": "2025-01-15T10:30:00Z"
-            }
-        }
\ No newline at end of file
+    timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow)
\ No newline at end of file
@@ -5,7 +5,8 @@ This module makes the services directory a Python package.
 """
 
 from .room_service import RoomService
+from .snapshot_service import SnapshotService
 from .autocomplete_service import AutocompleteService
 from .websocket_manager import WebSocketManager
 
-__all__ = ["RoomService", "AutocompleteService", "WebSocketManager"]
\ No newline at end of file
+__all__ = ["RoomService", "SnapshotService", "AutocompleteService", "WebSocketManager"]
\ No newline at end of file
@@ -9,28 +9,133 @@ be replaced with:
 """
 
 from app.schemas import AutocompleteResponse
+from functools import lru_cache
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Python line patterns, in priority order (first match wins)
+PYTHON_PATTERNS = {
+    "print_statement": r'print\($',
+    "function_def": r'def\s+\w+\([^)]*\):\s*$',
+    "class_def": r'class\s+\w+.*:\s*$',
+    "import_statement": r'from\s+\w+\s+import\s+$',
+    "for_loop": r'for\s+\w+\s+in\s+$',
+    "if_statement": r'if\s+.*:\s*$',
+    "return_statement": r'\s+return\s+$',
+    "list_comprehension": r'\[.*for\s+\w+\s+in\s+$',
+}
+
+# Suggestion for each Python pattern: (suggestion_text, confidence, type)
+PYTHON_SUGGESTIONS = {
+    "print_statement": ("'Hello, World!')", 0.85, "completion"),
+    "function_def": ('\n    """Function description."""', 0.80, "docstring"),
+    "class_def": ("\n    def __init__(self):\n        pass", 0.82, "method"),
+    "import_statement": ("typing import List, Dict, Optional", 0.75, "import"),
+    "for_loop": ("range(10):\n        ", 0.78, "completion"),
+    "if_statement": ("\n        pass", 0.70, "statement"),
+    "return_statement": ("None", 0.70, "return_value"),
+    "list_comprehension": ("items]", 0.73, "comprehension"),
+}
+
+# Fuse the Python patterns into one compiled alternation so each line is
+# matched with a single regex call. Every branch is anchored at the start and
+# prefixed with a lazy .*?, so branches are tried in priority order exactly
+# like sequential search() calls.
+PYTHON_PATTERN = re.compile("|".join(
+    f"(?P<{name}>.*?{pattern})" for name, pattern in PYTHON_PATTERNS.items()
+))
+
+# Common keywords per language, for basic keyword completion
+LANGUAGE_KEYWORDS = {
+    "python": frozenset((
+        "def", "class", "import", "from", "if", "elif", "else",
+        "for", "while", "try", "except", "finally", "with",
+        "return", "yield", "lambda", "pass", "break", "continue"
+    )),
+    "javascript": frozenset((
+        "function", "const", "let", "var", "if", "else", "for",
+        "while", "return", "async", "await", "try", "catch",
+        "class", "extends", "import", "export", "default"
+    )),
+    "typescript": frozenset((
+        "function", "const", "let", "var", "if", "else", "for",
+        "while", "return", "async", "await", "try", "catch",
+        "class", "extends", "import", "export", "default",
+        "interface", "type", "enum", "public", "private"
+    )),
+}
+
+# Lines (or language names) longer than this aren't memoized, so the cache
+# can't be made to hold arbitrarily large request bodies
+MAX_CACHED_LINE_LENGTH = 256
+
+def _match_line(last_line: str, language: str) -> tuple[str, float, str]:
+    """
+    Match the line before the cursor against the suggestion rules.
+    
+    The result depends only on (last_line, language), so short lines are
+    memoized (see _match_line_cached); while typing, the same trailing
+    lines recur constantly.
+    
+    Args:
+        last_line: Last line of code before the cursor
+        language: Programming language
+        
+    Returns:
+        tuple: (suggestion_text, confidence, type)
+    """
+    # Python-specific patterns
+    if language == "python":
+        match = PYTHON_PATTERN.match(last_line)
+        
+        if match:
+            return PYTHON_SUGGESTIONS[match.lastgroup]
+        
+        # Common variable assignments
+        if "= [" in last_line and last_line.endswith("["):
+            return "1, 2, 3]", 0.65, "list_literal"
+        
+        if "= {" in last_line and last_line.endswith("{"):
+            return "'key': 'value'}", 0.65, "dict_literal"
+        
+        # Method call patterns
+        if ".append(" in last_line and last_line.endswith("("):
+            return "item)", 0.72, "method_arg"
+        
+        if ".join(" in last_line and last_line.endswith("("):
+            return "items)", 0.74, "method_arg"
+    
+    # JavaScript-specific patterns
+    elif language == "javascript":
+        if "console.log(" in last_line:
+            return "'Hello, World!')", 0.85, "completion"
+        
+        if last_line.strip().endswith("=>"):
+            return " {\n    \n}", 0.80, "arrow_function"
+        
+        if "const " in last_line and last_line.endswith("= "):
+            return "[]", 0.70, "initialization"
+    
+    # Generic fallback suggestions
+    if last_line.strip().endswith("("):
+        return ")", 0.60, "bracket_close"
+    
+    if last_line.strip().endswith("["):
+        return "]", 0.60, "bracket_close"
+    
+    if last_line.strip().endswith("{"):
+        return "}", 0.60, "bracket_close"
+    
+    # Default suggestion when no pattern matches
+    return "# TODO: Implement", 0.50, "comment"
+
+_match_line_cached = lru_cache(maxsize=4096)(_match_line)
+
 class AutocompleteService:
     """Service for generating intelligent code autocomplete suggestions."""
     
-    def __init__(self):
-        """Initialize autocomplete service with rule patterns."""
-        # Compile regex patterns for better performance
-        self.patterns = {
-            "print_statement": re.compile(r'print\($'),
-            "function_def": re.compile(r'def\s+\w+\([^)]*\):\s*$'),
-            "class_def": re.compile(r'class\s+\w+.*:\s*$'),
-            "import_statement": re.compile(r'from\s+\w+\s+import\s+$'),
-            "for_loop": re.compile(r'for\s+\w+\s+in\s+$'),
-            "if_statement": re.compile(r'if\s+.*:\s*$'),
-            "return_statement": re.compile(r'\s+return\s+$'),
-            "list_comprehension": re.compile(r'\[.*for\s+\w+\s+in\s+$'),
-        }
-    
     def generate_suggestion(
         self,
         code: str,
@@ -60,17 +165,16 @@ class AutocompleteService:
             )
             # Returns: AutocompleteResponse(suggestion="'Hello, World!')")
         """
-        # Get code context before cursor
-        context = code[:cursor_position]
-        
-        # Get last line for pattern matching
-        lines = context.split('\n')
-        last_line = lines[-1] if lines else ""
+        # Get last line before the cursor for pattern matching, without
+        # copying or splitting the rest of the buffer
+        line_start = code.rfind('\n', 0, cursor_position) + 1
+        last_line = code[line_start:cursor_position]
         
         # Try to match patterns and generate suggestions
         suggestion_text, confidence, suggestion_type = self._match_patterns(
             last_line,
-            context,
+            code,
+            cursor_position,
             language
         )
         
@@ -88,96 +192,38 @@ class AutocompleteService:
     def _match_patterns(
         self,
         last_line: str,
-        context: str,
+        code: str,
+        cursor_position: int,
         language: str
     ) -> tuple[str, float, str]:
         """
         Match code patterns and generate appropriate suggestions.
         
         Args:
-            last_line: Last line of code
-            context: Full code context
+            last_line: Last line of code before the cursor
+            code: Full code content
+            cursor_position: Cursor position in code
             language: Programming language
             
         Returns:
             tuple: (suggestion_text, confidence, type)
         """
-        # Python-specific patterns
-        if language == "python":
-            # Print statement completion
-            if self.patterns["print_statement"].search(last_line):
-                return "'Hello, World!')", 0.85, "completion"
-            
-            # Function definition - suggest docstring
-            if self.patterns["function_def"].search(last_line):
-                return '\n    """Function description."""', 0.80, "docstring"
-            
-            # Class definition - suggest pass or init
-            if self.patterns["class_def"].search(last_line):
-                return "\n    def __init__(self):\n        pass", 0.82, "method"
-            
-            # Import completion
-            if self.patterns["import_statement"].search(last_line):
-                return "typing import List, Dict, Optional", 0.75, "import"
-            
-            # For loop - suggest range
-            if self.patterns["for_loop"].search(last_line):
-                return "range(10):\n        ", 0.78, "completion"
-            
-            # If statement - suggest pass
-            if self.patterns["if_statement"].search(last_line):
-                return "\n        pass", 0.70, "statement"
-            
-            # Return statement context
-            if self.patterns["return_statement"].search(last_line):
-                # Check if in function that might return bool
-                if "def is_" in context or "def has_" in context:
-                    return "True", 0.75, "boolean"
-                return "None", 0.70, "return_value"
-            
-            # List comprehension
-            if self.patterns["list_comprehension"].search(last_line):
-                return "items]", 0.73, "comprehension"
-            
-            # Common variable assignments
-            if "= [" in last_line and last_line.endswith("["):
-                return "1, 2, 3]", 0.65, "list_literal"
-            
-            if "= {" in last_line and last_line.endswith("{"):
-                return "'key': 'value'}", 0.65, "dict_literal"
-            
-            # Method call patterns
-            if ".append(" in last_line and last_line.endswith("("):
-                return "item)", 0.72, "method_arg"
-            
-            if ".join(" in last_line and last_line.endswith("("):
-                return "items)", 0.74, "method_arg"
-        
-        # JavaScript-specific patterns
-        elif language == "javascript":
-            if "console.log(" in last_line:
-                return "'Hello, World!')", 0.85, "completion"
-            
-            if last_line.strip().endswith("=>"):
-                return " {\n    \n}", 0.80, "arrow_function"
-            
-            if "const " in last_line and last_line.endswith("= "):
-                return "[]", 0.70, "initialization"
-        
-        # Generic fallback suggestions
-        if last_line.strip().endswith("("):
-            return ")", 0.60, "bracket_close"
-        
-        if last_line.strip().endswith("["):
-            return "]", 0.60, "bracket_close"
+        if len(last_line) > MAX_CACHED_LINE_LENGTH or len(language) > MAX_CACHED_LINE_LENGTH:
+            suggestion = _match_line(last_line, language)
+        else:
+            suggestion = _match_line_cached(last_line, language)
         
-        if last_line.strip().endswith("{"):
-            return "}", 0.60, "bracket_close"
+        # Return statements depend on the surrounding code, so resolve them
+        # outside the cache: suggest a boolean in predicate-style functions
+        if suggestion[2] == "return_value" and (
+            code.find("def is_", 0, cursor_position) != -1
+            or code.find("def has_", 0, cursor_position) != -1
+        ):
+            return "True", 0.75, "boolean"
         
-        # Default suggestion when no pattern matches
-        return "# TODO: Implement", 0.50, "comment"
+        return suggestion
     
-    def get_language_keywords(self, language: str) -> list[str]:
+    def get_language_keywords(self, language: str) -> frozenset[str]:
         """
         Get common keywords for a programming language.
         
@@ -187,25 +233,6 @@ class AutocompleteService:
             language: Programming language
             
         Returns:
-            list: Common keywords for the language
+            frozenset: Common keywords for the language
         """
-        keywords = {
-            "python": [
-                "def", "class", "import", "from", "if", "elif", "else",
-                "for", "while", "try", "except", "finally", "with",
-                "return", "yield", "lambda", "pass", "break", "continue"
-            ],
-            "javascript": [
-                "function", "const", "let", "var", "if", "else", "for",
-                "while", "return", "async", "await", "try", "catch",
-                "class", "extends", "import", "export", "default"
-            ],
-            "typescript": [
-                "function", "const", "let", "var", "if", "else", "for",
-                "while", "return", "async", "await", "try", "catch",
-                "class", "extends", "import", "export", "default",
-                "interface", "type", "enum", "public", "private"
-            ]
-        }
-        
-        return keywords.get(language, [])
\ No newline at end of file
+        return LANGUAGE_KEYWORDS.get(language, frozenset())
\ No newline at end of file
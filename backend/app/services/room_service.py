@@ -9,27 +9,49 @@ This service handles:
 - Snapshot management (for future undo/redo features)
 """
 
-from sqlalchemy.orm import Session
-from app.models import Room, CodeSnapshot
+from cachetools import TTLCache
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import CodeSnapshot, Room, ROOM_ID_LENGTH
+from typing import Dict, List
+from app.services.snapshot_service import SnapshotService
+import secrets
 from datetime import datetime
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Recently read rooms (detached from their session), shared by all RoomService
+# instances so reconnect bursts don't repeat the same SELECT. Least recently
+# used rooms are evicted when full; the TTL bounds how long writes made by
+# other worker processes can go unseen.
+_room_cache: TTLCache = TTLCache(maxsize=10_000, ttl=5)
+
+# Starter code for new rooms by language
+_TEMPLATES = {
+    "python": "# Write your Python code here\n\n",
+    "javascript": "// Write your JavaScript code here\n\n",
+    "typescript": "// Write your TypeScript code here\n\n",
+    "java": "// Write your Java code here\n\npublic class Main {\n    public static void main(String[] args) {\n        \n    }\n}\n",
+    "cpp": "// Write your C++ code here\n\n#include <iostream>\n\nint main() {\n    \n    return 0;\n}\n",
+    "go": "// Write your Go code here\n\npackage main\n\nimport \"fmt\"\n\nfunc main() {\n    \n}\n"
+}
+
 class RoomService:
     """Service class for managing collaborative coding rooms."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """
         Initialize room service with database session.
         
         Args:
-            db: SQLAlchemy database session
+            db: SQLAlchemy async database session
         """
         self.db = db
     
-    def create_room(self, language: str = "python") -> Room:
+    async def create_room(self, language: str = "python") -> Room:
         """
         Create a new collaborative coding room.
         
@@ -41,10 +63,11 @@ class RoomService:
             
         Example:
             room_service = RoomService(db)
-            room = room_service.create_room(language="javascript")
+            room = await room_service.create_room(language="javascript")
         """
         # Generate unique room ID
-        room_id = str(uuid.uuid4())[:8]  # Use shorter ID for easier sharing
+        # Short base64url share code: 6 random bytes encode to 8 characters
+        room_id = secrets.token_urlsafe(ROOM_ID_LENGTH * 3 // 4)
         
         # Create default code template based on language
         default_code = self._get_default_code(language)
@@ -53,37 +76,63 @@ class RoomService:
         room = Room(
             id=room_id,
             code=default_code,
-            language=language,
-            created_at=datetime.utcnow()
+            language=language
         )
         
-        # Save to database
+        # Save to database; timestamps come back with the INSERT
         self.db.add(room)
-        self.db.commit()
-        self.db.refresh(room)
+        await self.db.commit()
         
         logger.info(f"Created room {room_id} with language {language}")
         return room
     
-    def get_room(self, room_id: str) -> Room | None:
+    async def get_room(self, room_id: str, with_snapshots: bool = False) -> Room | None:
         """
         Retrieve room by ID.
         
+        Snapshots are not loaded by default since most callers only need the
+        current code. Pass with_snapshots=True to fetch them in the same
+        round trip (async sessions can't lazy-load them later).
+        
+        Without snapshots, rooms are served from a short-lived in-process
+        cache. The returned instance is detached and must be treated as
+        read-only.
+        
         Args:
             room_id: Unique room identifier
+            with_snapshots: Eagerly load the room's code snapshots
             
         Returns:
             Room: Room instance if found, None otherwise
             
         Example:
-            room = room_service.get_room("abc123")
+            room = await room_service.get_room("abc123")
             if room:
                 print(room.code)
         """
-        room = self.db.query(Room).filter(Room.id == room_id).first()
+        if with_snapshots:
+            return await self._fetch_room(room_id, with_snapshots=True)
+        
+        room = _room_cache.get(room_id)
+        if room is not None:
+            return room
+        
+        room = await self._fetch_room(room_id)
+        
+        if room:
+            # Detach so the instance can be shared across sessions
+            self.db.expunge(room)
+            _room_cache[room_id] = room
+        
         return room
     
-    def update_room_code(self, room_id: str, code: str, user_identifier: str | None = None) -> Room | None:
+    async def update_room_code(
+        self,
+        room_id: str,
+        code: str,
+        user_identifier: str | None = None,
+        version: int | None = None
+    ) -> bool:
         """
         Update code content in a room.
         
@@ -91,40 +140,137 @@ class RoomService:
             room_id: Unique room identifier
             code: New code content
             user_identifier: Optional user who made the change
+            version: Optional version of the code; if given, the room is only
+                updated if it holds an older version
             
         Returns:
-            Room: Updated room instance if found, None otherwise
+            bool: True if updated, False if room not found (or already newer)
             
         Example:
-            updated_room = room_service.update_room_code(
+            updated = await room_service.update_room_code(
                 "abc123",
                 "print('Hello World')",
                 user_identifier="user_456"
             )
         """
-        room = self.get_room(room_id)
+        versions = {room_id: version} if version is not None else None
+        return await self.update_rooms_code({room_id: code}, user_identifier, versions) == 1
+    
+    async def update_rooms_code(
+        self,
+        codes: Dict[str, str],
+        user_identifier: str | None = None,
+        versions: Dict[str, int] | None = None
+    ) -> int:
+        """
+        Update code content in several rooms with a single commit.
         
-        if not room:
-            logger.warning(f"Attempted to update non-existent room {room_id}")
-            return None
+        Issues one UPDATE per room and an INSERT (or UPDATE) for its
+        snapshot, all in one transaction, so the whole batch costs one
+        fsync. Rooms that don't exist are skipped. If any statement fails,
+        nothing in the batch is saved. Cached copies of the updated rooms
+        are updated in place.
         
-        # Create snapshot before updating (for history/undo feature)
-        self._create_snapshot(room_id, room.code, user_identifier)
+        Code with a version only replaces an older version, so a slow write
+        (e.g. from another worker) can't overwrite newer code.
         
-        # Update room code
-        room.code = code
-        room.updated_at = datetime.utcnow()
+        Args:
+            codes: New code content per room ID
+            user_identifier: Optional user who made the changes
+            versions: Optional version of the code per room ID
+            
+        Returns:
+            int: Number of rooms updated
+            
+        Example:
+            updated = await room_service.update_rooms_code({
+                "abc123": "print('Hello World')",
+                "def456": "console.log('Hello World');"
+            })
+        """
+        versions = versions or {}
+        updated: Dict[str, datetime] = {}
         
-        self.db.commit()
-        self.db.refresh(room)
+        try:
+            for room_id, code in codes.items():
+                statement = update(Room).where(Room.id == room_id)
+                
+                version = versions.get(room_id)
+                if version is None:
+                    statement = statement.values(code=code)
+                else:
+                    statement = statement.where(Room.version < version).values(code=code, version=version)
+                
+                result = await self.db.execute(statement.returning(Room.updated_at))
+                updated_at = result.scalar_one_or_none()
+                
+                if updated_at is None:
+                    if version is None:
+                        logger.warning(f"Attempted to update non-existent room {room_id}")
+                    else:
+                        logger.warning(f"Skipped code for room {room_id}: room not found or already at a newer version")
+                    continue
+                
+                updated[room_id] = updated_at
+                
+                # Record the new code state (for history/undo feature)
+                await self._create_snapshot(room_id, code, user_identifier)
+            
+            if not updated:
+                await self.db.rollback()
+                return 0
+            
+            await self.db.commit()
+        except Exception:
+            # Snapshots appended before the failure were rolled back with it
+            await self.db.rollback()
+            for room_id in codes:
+                SnapshotService.discard_head(room_id)
+            raise
         
-        logger.debug(f"Updated code in room {room_id}")
-        return room
+        for room_id, updated_at in updated.items():
+            room = _room_cache.get(room_id)
+            if room is not None:
+                set_committed_value(room, "code", codes[room_id])
+                set_committed_value(room, "updated_at", updated_at)
+                if room_id in versions:
+                    set_committed_value(room, "version", versions[room_id])
+        
+        logger.debug(f"Updated code in {len(updated)} room(s)")
+        return len(updated)
     
-    def delete_room(self, room_id: str) -> bool:
+    async def list_snapshots(self, room_id: str, limit: int = 50) -> List[CodeSnapshot]:
+        """
+        Get a room's most recent snapshots in one query.
+        
+        Most snapshots hold a delta; use SnapshotService.get_code to read
+        the code of a snapshot.
+        
+        Args:
+            room_id: Unique room identifier
+            limit: Maximum number of snapshots to return
+            
+        Returns:
+            list: Snapshots, newest first
+            
+        Example:
+            snapshots = await room_service.list_snapshots("abc123", limit=10)
+        """
+        result = await self.db.execute(
+            select(CodeSnapshot)
+            .where(CodeSnapshot.room_id == room_id)
+            .order_by(CodeSnapshot.timestamp.desc(), CodeSnapshot.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def delete_room(self, room_id: str) -> bool:
         """
         Delete a room and all associated data.
         
+        Deletes the room's snapshots and the room with two DELETE statements
+        in one transaction, without loading either first.
+        
         Args:
             room_id: Unique room identifier
             
@@ -132,20 +278,46 @@ class RoomService:
             bool: True if deleted, False if not found
             
         Example:
-            success = room_service.delete_room("abc123")
+            success = await room_service.delete_room("abc123")
         """
-        room = self.get_room(room_id)
+        await self.db.execute(
+            delete(CodeSnapshot).where(CodeSnapshot.room_id == room_id)
+        )
+        result = await self.db.execute(
+            delete(Room).where(Room.id == room_id)
+        )
         
-        if not room:
+        if result.rowcount == 0:
+            await self.db.rollback()
             return False
         
-        self.db.delete(room)
-        self.db.commit()
+        await self.db.commit()
+        SnapshotService.discard_head(room_id)
+        _room_cache.pop(room_id, None)
         
         logger.info(f"Deleted room {room_id}")
         return True
     
-    def _create_snapshot(self, room_id: str, code: str, user_identifier: str | None = None):
+    async def _fetch_room(self, room_id: str, with_snapshots: bool = False) -> Room | None:
+        """
+        Load a room from the database, bypassing the cache.
+        
+        Args:
+            room_id: Unique room identifier
+            with_snapshots: Eagerly load the room's code snapshots
+            
+        Returns:
+            Room: Room instance attached to this session if found, None otherwise
+        """
+        query = select(Room).where(Room.id == room_id)
+        
+        if with_snapshots:
+            query = query.options(selectinload(Room.snapshots))
+        
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none()
+    
+    async def _create_snapshot(self, room_id: str, code: str, user_identifier: str | None = None):
         """
         Create a snapshot of the current code state.
         
@@ -154,22 +326,19 @@ class RoomService:
         - History viewing
         - Time-travel debugging
         
+        Snapshots are delta-encoded by SnapshotService. The snapshot is
+        inserted but not committed; the caller owns the transaction.
+        
         Args:
             room_id: Room identifier
             code: Code content to snapshot
             user_identifier: Optional user who made the change
         """
-        snapshot = CodeSnapshot(
-            room_id=room_id,
-            code=code,
-            timestamp=datetime.utcnow(),
+        await SnapshotService(self.db).append(
+            room_id,
+            code,
             user_identifier=user_identifier
         )
-        
-        self.db.add(snapshot)
-        self.db.commit()
-        
-        logger.debug(f"Created snapshot for room {room_id}")
     
     def _get_default_code(self, language: str) -> str:
         """
@@ -181,13 +350,4 @@ class RoomService:
         Returns:
             str: Default code template
         """
-        templates = {
-            "python": "# Write your Python code here\n\n",
-            "javascript": "// Write your JavaScript code here\n\n",
-            "typescript": "// Write your TypeScript code here\n\n",
-            "java": "// Write your Java code here\n\npublic class Main {\n    public static void main(String[] args) {\n        \n    }\n}\n",
-            "cpp": "// Write your C++ code here\n\n#include <iostream>\n\nint main() {\n    \n    return 0;\n}\n",
-            "go": "// Write your Go code here\n\npackage main\n\nimport \"fmt\"\n\nfunc main() {\n    \n}\n"
-        }
-        
-        return templates.get(language, f"// Write your {language} code here\n\n")
\ No newline at end of file
+        return _TEMPLATES.get(language) or f"// Write your {language} code here\n\n"
\ No newline at end of file
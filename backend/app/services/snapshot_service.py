@@ -0,0 +1,364 @@
+"""
+Snapshot service for storing code history compactly.
+
+Consecutive snapshots of a room differ by a few characters, so instead of
+a full copy per snapshot this service stores:
+- A full snapshot every FULL_SNAPSHOT_INTERVAL snapshots
+- A delta against the previous snapshot otherwise
+
+A delta is the length of the unchanged prefix, the length of the unchanged
+suffix, and the text that replaced everything in between. Payloads (full
+code or delta) of COMPRESS_MIN_SIZE bytes or more are zlib-compressed.
+
+Snapshots are throttled to one per room per SNAPSHOT_MIN_INTERVAL: changes
+within the interval update the latest snapshot instead of adding a row, and
+unchanged code isn't recorded at all.
+"""
+
+from cachetools import TTLCache
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import CodeSnapshot
+from typing import NamedTuple
+import logging
+import orjson
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Store a full copy every N snapshots so reconstruction walks at most N-1 deltas
+FULL_SNAPSHOT_INTERVAL = 50
+
+# Payloads at least this large are stored compressed (bytes)
+COMPRESS_MIN_SIZE = 256
+
+# First byte of every stored payload: how the rest is encoded
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+# Minimum time between new snapshot rows for a room (seconds)
+SNAPSHOT_MIN_INTERVAL = 2.0
+
+
+class _Head(NamedTuple):
+    """Latest snapshot written for a room by this process."""
+    snapshot_id: int
+    code: str
+    depth: int  # Deltas since the last full snapshot
+    base_code: str | None  # Code the delta applies to (None for full snapshots)
+    created_at: float  # time.monotonic() when the row was inserted
+
+
+# Latest snapshot per recently edited room. Each entry holds up to two copies
+# of the room's code, so idle and least recently used rooms are evicted; a room
+# without an entry just starts a new chain with a full snapshot.
+_heads: TTLCache = TTLCache(maxsize=1_000, ttl=600)
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the common prefix of two strings.
+    
+    Uses a binary search over slice comparisons so the character scan
+    happens in C rather than a Python loop.
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix of two strings, capped at limit."""
+    low, high = 0, limit
+    len_a, len_b = len(a), len(b)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len_a - mid:len_a - low] == b[len_b - mid:len_b - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def encode_delta(base: str, code: str) -> bytes:
+    """
+    Encode the change from base to code.
+    
+    Args:
+        base: Previous code content
+        code: New code content
+    
+    Returns:
+        bytes: Encoded delta
+    
+    Example:
+        delta = encode_delta("print('hi')", "print('hello')")
+        assert apply_delta("print('hi')", delta) == "print('hello')"
+    """
+    prefix = _common_prefix_length(base, code)
+    limit = min(len(base), len(code)) - prefix
+    suffix = _common_suffix_length(base, code, limit)
+    inserted = code[prefix:len(code) - suffix]
+    return _pack(orjson.dumps([prefix, suffix, inserted]))
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    """
+    Apply a delta produced by encode_delta.
+    
+    Args:
+        base: Code the delta was computed against
+        delta: Encoded delta
+    
+    Returns:
+        str: Reconstructed code
+    """
+    prefix, suffix, inserted = orjson.loads(_unpack(delta))
+    return base[:prefix] + inserted + base[len(base) - suffix:]
+
+
+def encode_full(code: str) -> bytes:
+    """
+    Encode code for a full snapshot.
+    
+    Args:
+        code: Code content
+    
+    Returns:
+        bytes: Encoded code
+    """
+    return _pack(code.encode())
+
+
+def decode_full(payload: bytes) -> str:
+    """
+    Decode code stored by encode_full.
+    
+    Args:
+        payload: Encoded code
+    
+    Returns:
+        str: Code content
+    """
+    return _unpack(payload).decode()
+
+
+def _pack(data: bytes) -> bytes:
+    """Prefix data with its encoding, compressing it if large enough to pay off."""
+    if len(data) >= COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return _ZLIB + compressed
+    return _RAW + data
+
+
+def _unpack(payload: bytes) -> bytes:
+    """Reverse _pack."""
+    if payload[:1] == _ZLIB:
+        return zlib.decompress(payload[1:])
+    return payload[1:]
+
+
+class SnapshotService:
+    """Service class for writing and reading delta-encoded code snapshots."""
+    
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize snapshot service with database session.
+        
+        Args:
+            db: SQLAlchemy async database session
+        """
+        self.db = db
+    
+    async def append(
+        self,
+        room_id: str,
+        code: str,
+        user_identifier: str | None = None
+    ) -> int:
+        """
+        Record a new snapshot of a room's code.
+        
+        The snapshot is written but not committed; the caller owns the
+        transaction and should call discard_head if it rolls back.
+        
+        Within SNAPSHOT_MIN_INTERVAL of the room's latest snapshot, that
+        snapshot is updated to the new code instead of inserting a row.
+        
+        Args:
+            room_id: Room identifier
+            code: Code content to snapshot
+            user_identifier: Optional user who made the change
+        
+        Returns:
+            int: ID of the snapshot holding the code
+        
+        Example:
+            snapshot_id = await SnapshotService(db).append("abc123", "print('hi')")
+        """
+        head = _heads.get(room_id)
+        now = time.monotonic()
+        
+        if head is not None:
+            # Nothing changed since the latest snapshot
+            if head.code == code:
+                return head.snapshot_id
+            
+            if now - head.created_at < SNAPSHOT_MIN_INTERVAL:
+                return await self._amend(room_id, head, code)
+        
+        # After a restart (or every N snapshots) start a new chain with a full copy
+        if head is None or head.depth + 1 >= FULL_SNAPSHOT_INTERVAL:
+            values = {"is_full": True, "payload": encode_full(code)}
+            depth = 0
+            base_code = None
+        else:
+            values = {
+                "is_full": False,
+                "base_id": head.snapshot_id,
+                "payload": encode_delta(head.code, code)
+            }
+            depth = head.depth + 1
+            base_code = head.code
+        
+        result = await self.db.execute(
+            insert(CodeSnapshot)
+            .values(
+                room_id=room_id,
+                user_identifier=user_identifier,
+                **values
+            )
+            .returning(CodeSnapshot.id)
+        )
+        snapshot_id = result.scalar_one()
+        
+        _heads[room_id] = _Head(snapshot_id, code, depth, base_code, now)
+        
+        logger.debug(f"Created {'full' if depth == 0 else 'delta'} snapshot {snapshot_id} for room {room_id}")
+        return snapshot_id
+    
+    async def _amend(self, room_id: str, head: _Head, code: str) -> int:
+        """
+        Update a room's latest snapshot to hold new code.
+        
+        Args:
+            room_id: Room identifier
+            head: Room's latest snapshot
+            code: New code content
+        
+        Returns:
+            int: ID of the updated snapshot
+        """
+        if head.base_code is None:
+            payload = encode_full(code)
+        else:
+            payload = encode_delta(head.base_code, code)
+        
+        await self.db.execute(
+            update(CodeSnapshot)
+            .where(CodeSnapshot.id == head.snapshot_id)
+            .values(timestamp=func.now(), payload=payload)
+        )
+        
+        _heads[room_id] = head._replace(code=code)
+        
+        logger.debug(f"Updated snapshot {head.snapshot_id} for room {room_id}")
+        return head.snapshot_id
+    
+    async def get_code(self, snapshot_id: int) -> str | None:
+        """
+        Reconstruct the code stored by a snapshot.
+        
+        Loads the snapshot's chain back to the nearest full snapshot in one
+        query and applies the deltas in order.
+        
+        Args:
+            snapshot_id: Snapshot identifier
+        
+        Returns:
+            str: Code at that snapshot, or None if the snapshot doesn't exist
+                or its chain is broken (a missing base or a cycle)
+        
+        Example:
+            code = await SnapshotService(db).get_code(42)
+        """
+        target = await self.db.get(CodeSnapshot, snapshot_id)
+        
+        if target is None:
+            return None
+        
+        if target.is_full:
+            return decode_full(target.payload)
+        
+        last_full_id = (
+            select(func.max(CodeSnapshot.id))
+            .where(
+                CodeSnapshot.room_id == target.room_id,
+                CodeSnapshot.is_full.is_(True),
+                CodeSnapshot.id <= snapshot_id
+            )
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            select(
+                CodeSnapshot.id,
+                CodeSnapshot.is_full,
+                CodeSnapshot.base_id,
+                CodeSnapshot.payload
+            )
+            .where(
+                CodeSnapshot.room_id == target.room_id,
+                CodeSnapshot.id >= last_full_id,
+                CodeSnapshot.id <= snapshot_id
+            )
+        )
+        rows = {row.id: row for row in result}
+        
+        # Walk back to the full snapshot, collecting deltas
+        deltas = []
+        # Without a full snapshot before it in the room the query finds nothing
+        row = rows.get(snapshot_id, target)
+        while not row.is_full:
+            # A delta's base is always an earlier row, so ids strictly decrease
+            # along a valid chain; anything else would never reach a full snapshot
+            if row.base_id is None or row.base_id >= row.id:
+                logger.error(f"Snapshot {snapshot_id} has a broken delta chain at {row.id}")
+                return None
+            
+            deltas.append(row.payload)
+            
+            # Chains written by another process may start before the last full snapshot
+            if row.base_id not in rows:
+                code = await self.get_code(row.base_id)
+                if code is None:
+                    return None
+                break
+            
+            row = rows[row.base_id]
+        else:
+            code = decode_full(row.payload)
+        
+        for delta in reversed(deltas):
+            code = apply_delta(code, delta)
+        
+        return code
+    
+    @staticmethod
+    def discard_head(room_id: str):
+        """
+        Forget the cached latest snapshot for a room.
+        
+        Call this when a transaction containing append() is rolled back or
+        the room is deleted; the next snapshot will be stored in full.
+        
+        Args:
+            room_id: Room identifier
+        """
+        _heads.pop(room_id, None)
@@ -3,17 +3,136 @@ WebSocket connection manager for handling multiple concurrent connections.
 
 This manager maintains:
 - Connection pools per room
-- Broadcasting logic
+- Broadcasting logic, batched per room
 - Connection lifecycle management
+- Authoritative code buffer per room, edited by incremental text ops
+- Buffered (debounced) code writes per room
+- Optional cross-worker fan-out through Redis pub/sub, with room code
+  and versions shared by all workers
 """
 
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Set
+import asyncio
 import logging
-import json
+import orjson
+import uuid
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
 
 logger = logging.getLogger(__name__)
 
+# Delay before buffered code updates for all rooms are written to the database (seconds)
+CODE_FLUSH_DELAY = 0.25
+
+# Times a room's code is retried after failing to save before it is dropped
+SAVE_ATTEMPTS = 3
+
+# How long broadcasts wait to be batched into one frame per connection (seconds)
+BROADCAST_INTERVAL = 0.01
+
+# Message types where only the latest of consecutive messages matters
+COALESCED_TYPES = frozenset(("code_update",))
+
+
+# Pre-encoded user_count messages for typical room sizes
+_USER_COUNT_FRAMES = tuple(
+    orjson.dumps({"type": "user_count", "count": count}) for count in range(65)
+)
+
+
+def user_count_frame(count: int) -> bytes:
+    """
+    Serialized user_count message, pre-encoded for rooms of up to 64 users.
+    
+    Args:
+        count: Number of connected users
+    
+    Returns:
+        bytes: JSON message
+    """
+    if count < len(_USER_COUNT_FRAMES):
+        return _USER_COUNT_FRAMES[count]
+    
+    return orjson.dumps({"type": "user_count", "count": count})
+
+
+def apply_ops(code: str, ops: List[dict]) -> str:
+    """
+    Apply a list of text operations to code.
+    
+    Operations walk the code from the start: {"retain": n} keeps the next
+    n characters, {"delete": n} removes them and {"insert": "text"} inserts
+    text at the current position. Anything after the last operation is kept.
+    
+    Args:
+        code: Code to edit
+        ops: Text operations
+    
+    Returns:
+        str: Edited code
+    
+    Raises:
+        ValueError: If an operation is malformed or runs past the end of the code
+    
+    Example:
+        apply_ops("print('hi')", [{"retain": 7}, {"delete": 2}, {"insert": "bye"}])
+        # "print('bye')"
+    """
+    if not isinstance(ops, list):
+        raise ValueError(f"Invalid ops: {ops!r}")
+    
+    parts = []
+    position = 0
+    
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError(f"Invalid op: {op!r}")
+        
+        if "insert" in op:
+            if not isinstance(op["insert"], str):
+                raise ValueError(f"Invalid insert: {op!r}")
+            parts.append(op["insert"])
+            continue
+        
+        count = op.get("retain", op.get("delete"))
+        if type(count) is not int or count < 0:
+            raise ValueError(f"Invalid op: {op!r}")
+        if position + count > len(code):
+            raise ValueError(f"Op runs past end of code: {op!r}")
+        
+        if "retain" in op:
+            parts.append(code[position:position + count])
+        position += count
+    
+    parts.append(code[position:])
+    return "".join(parts)
+
+
+# Redis channel name prefix; each room publishes on "room:{room_id}"
+CHANNEL_PREFIX = "room:"
+
+# Redis hash holding a room's current code and version, shared by all workers
+DOCUMENT_PREFIX = "document:"
+
+# How long a room's shared document is kept after its last edit (seconds)
+DOCUMENT_TTL = 86400
+
+# Store new code for a room and return its new version, or nil if the
+# expected version (ARGV[1], empty to skip the check) isn't current. A room
+# without a shared document continues from the caller's version (ARGV[4])
+COMMIT_SCRIPT = """
+local version = tonumber(redis.call("HGET", KEYS[1], "version") or ARGV[4])
+if ARGV[1] ~= "" and tonumber(ARGV[1]) ~= version then
+    return false
+end
+version = version + 1
+redis.call("HSET", KEYS[1], "code", ARGV[2], "version", version)
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return version
+"""
+
 class WebSocketManager:
     """
     Manages WebSocket connections for real-time collaboration.
@@ -22,18 +141,62 @@ class WebSocketManager:
     connection pool across the application.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        persist_code: Callable[[Dict[str, str], Dict[str, int]], Awaitable[object]] | None = None,
+        redis: "Redis | None" = None
+    ):
         """
         Initialize WebSocket manager with empty connection pools.
         
         Structure:
             {
-                "room_id_1": [websocket1, websocket2, ...],
-                "room_id_2": [websocket3, websocket4, ...],
+                "room_id_1": {websocket1, websocket2, ...},
+                "room_id_2": {websocket3, websocket4, ...},
                 ...
             }
+        
+        Args:
+            persist_code: Coroutine function called with dicts of
+                room_id -> code and room_id -> version to save a batch of
+                buffered code updates; code must not replace a newer version
+            redis: Optional Redis client. When set, broadcasts are also
+                published so clients connected to other workers receive them,
+                and room versions are shared by all workers.
         """
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.persist_code = persist_code
+        
+        # Current code per room with connected clients, and its version;
+        # each accepted edit increments the version. With Redis, versions are
+        # assigned there and other workers' edits are applied as they arrive
+        self.documents: Dict[str, str] = {}
+        self.versions: Dict[str, int] = {}
+        
+        # Latest unsaved code per room and its version, saved for all rooms at
+        # once by one timer, and the batch currently being saved
+        self.pending_code: Dict[str, str] = {}
+        self.pending_versions: Dict[str, int] = {}
+        self._saving: Dict[str, str] = {}
+        self._saving_versions: Dict[str, int] = {}
+        self._failed_saves: Dict[str, int] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_lock = asyncio.Lock()
+        
+        # Last user count broadcast per room
+        self._last_user_count: Dict[str, int] = {}
+        
+        # Outgoing messages per room, sent in batches by one writer task per room
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        
+        # Cross-worker pub/sub: this worker's ID tags its own messages
+        self.redis = redis
+        self._commit = redis.register_script(COMMIT_SCRIPT) if redis is not None else None
+        self.worker_id = uuid.uuid4().hex.encode()
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
     
     async def connect(self, websocket: WebSocket, room_id: str):
         """
@@ -48,17 +211,21 @@ class WebSocketManager:
         """
         await websocket.accept()
         
-        # Initialize room connection list if it doesn't exist
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        
-        # Add connection to room
-        self.active_connections[room_id].append(websocket)
+        # Add connection to room, creating its set if needed; there's no await
+        # between the lookup and the add, so concurrent connects can't race
+        connections = self.active_connections.setdefault(room_id, set())
+        connections.add(websocket)
         
-        logger.info(
-            f"WebSocket connected to room {room_id}. "
-            f"Total connections in room: {len(self.active_connections[room_id])}"
+        # Per-connection events log lazily at debug level; at scale they are
+        # too frequent for INFO and the message is only built if enabled
+        logger.debug(
+            "WebSocket connected to room %s. Total connections in room: %d",
+            room_id, len(connections)
         )
+        
+        # First local client in the room: start receiving other workers' updates
+        if self.redis is not None and len(connections) == 1:
+            await self._subscribe(room_id)
     
     def disconnect(self, websocket: WebSocket, room_id: str):
         """
@@ -71,35 +238,61 @@ class WebSocketManager:
         Example:
             ws_manager.disconnect(websocket, "abc123")
         """
-        if room_id in self.active_connections:
-            try:
-                self.active_connections[room_id].remove(websocket)
-                
-                # Clean up empty room pools
-                if len(self.active_connections[room_id]) == 0:
-                    del self.active_connections[room_id]
-                    logger.info(f"Room {room_id} connection pool deleted (no active connections)")
-                else:
-                    logger.info(
-                        f"WebSocket disconnected from room {room_id}. "
-                        f"Remaining connections: {len(self.active_connections[room_id])}"
-                    )
-            except ValueError:
-                logger.warning(f"Attempted to disconnect non-existent websocket from room {room_id}")
+        connections = self.active_connections.get(room_id)
+        if connections is None:
+            return
+        
+        # Dead connections are removed while broadcasting, before the handler sees it
+        if websocket not in connections:
+            logger.debug("WebSocket already disconnected from room %s", room_id)
+            return
+        
+        connections.discard(websocket)
+        
+        # Clean up empty room pools
+        if not connections:
+            self.active_connections.pop(room_id, None)
+            logger.debug("Room %s connection pool deleted (no active connections)", room_id)
+            
+            # Pending code is still flushed; the next client reopens the document
+            self.documents.pop(room_id, None)
+            self.versions.pop(room_id, None)
+            self._last_user_count.pop(room_id, None)
+            
+            # Nobody is left to send queued messages to
+            writer = self._writers.pop(room_id, None)
+            if writer is not None:
+                writer.cancel()
+            self._queues.pop(room_id, None)
+            
+            if self.redis is not None:
+                self._spawn(self._unsubscribe(room_id))
+        else:
+            logger.debug(
+                "WebSocket disconnected from room %s. Remaining connections: %d",
+                room_id, len(connections)
+            )
     
     async def broadcast(
         self,
         room_id: str,
-        message: dict,
-        exclude: WebSocket | None = None
+        message: dict | bytes,
+        exclude: WebSocket | None = None,
+        local_only: bool = False
     ):
         """
         Broadcast a message to all connections in a room.
         
+        The message is serialized once and queued for the room's writer,
+        which sends everything queued within BROADCAST_INTERVAL as one frame
+        per connection. With Redis configured it is also published for
+        connections held by other workers.
+        
         Args:
             room_id: Room identifier
-            message: Message dictionary to broadcast
+            message: Message dictionary, or already-serialized JSON bytes
             exclude: Optional WebSocket to exclude from broadcast (e.g., sender)
+            local_only: Only send to connections held by this worker
             
         Example:
             await ws_manager.broadcast(
@@ -108,49 +301,140 @@ class WebSocketManager:
                 exclude=sender_websocket
             )
         """
+        # Serialize once for the whole room rather than once per connection
+        payload = message if isinstance(message, bytes) else orjson.dumps(message)
+        
+        if self.redis is not None and not local_only:
+            await self._publish(room_id, payload)
+        
+        message_type = message.get("type") if isinstance(message, dict) else None
+        self._send_local(room_id, payload, exclude, message_type)
+    
+    def _send_local(
+        self,
+        room_id: str,
+        payload: bytes,
+        exclude: WebSocket | None = None,
+        message_type: str | None = None
+    ):
+        """
+        Queue a serialized message for this worker's connections in a room.
+        
+        Args:
+            room_id: Room identifier
+            payload: Serialized JSON message
+            exclude: Optional WebSocket to skip (e.g., sender)
+            message_type: Message type, used to coalesce superseded messages
+        """
         if room_id not in self.active_connections:
             logger.warning(f"Attempted to broadcast to non-existent room {room_id}")
             return
         
-        # Track failed connections for cleanup
-        dead_connections = []
+        # Fix the recipients now so clients joining before the batch is sent
+        # don't get messages from before they received the current code
+        recipients = self.active_connections[room_id] - {exclude}
+        if not recipients:
+            return
         
-        # Send message to all connections except excluded one
-        for connection in self.active_connections[room_id]:
-            if connection == exclude:
-                continue
+        if room_id not in self._writers:
+            self._queues[room_id] = asyncio.Queue()
+            self._writers[room_id] = asyncio.create_task(self._write_loop(room_id))
+        
+        self._queues[room_id].put_nowait((message_type, payload, recipients))
+    
+    async def _write_loop(self, room_id: str):
+        """Send a room's queued messages, batching those within BROADCAST_INTERVAL."""
+        queue = self._queues[room_id]
+        
+        while True:
+            messages = [await queue.get()]
+            
+            # Let messages arriving meanwhile join this batch
+            await asyncio.sleep(BROADCAST_INTERVAL)
+            while not queue.empty():
+                messages.append(queue.get_nowait())
             
             try:
-                await connection.send_json(message)
+                await self._send_batch(room_id, messages)
             except Exception as e:
-                logger.error(f"Error broadcasting to connection: {str(e)}")
-                dead_connections.append(connection)
+                logger.error(f"Error broadcasting to room {room_id}: {str(e)}")
+    
+    async def _send_batch(self, room_id: str, messages: List[tuple]):
+        """
+        Send queued messages as one frame per connection.
+        
+        A single message is sent as is; several are sent as
+        {"type": "batch", "events": [...]}. Of consecutive messages a
+        connection would receive with a type in COALESCED_TYPES, only the
+        last is sent.
+        
+        Args:
+            room_id: Room identifier
+            messages: (message_type, payload, recipients) tuples, oldest first
+        """
+        frames: Dict[tuple, str] = {}
+        targets = []
+        sends = []
+        
+        # Iterate a snapshot; failed sends below remove connections from the room
+        for connection in tuple(self.active_connections.get(room_id, ())):
+            received = [i for i, message in enumerate(messages) if connection in message[2]]
+            
+            # Drop messages superseded by the next one of the same type
+            key = tuple(
+                i for i, j in zip(received, received[1:] + [None])
+                if j is None
+                or messages[i][0] not in COALESCED_TYPES
+                or messages[i][0] != messages[j][0]
+            )
+            if not key:
+                continue
+            
+            # Connections receiving the same messages share one encoded frame
+            if key not in frames:
+                if len(key) == 1:
+                    frames[key] = messages[key[0]][1].decode()
+                else:
+                    events = b",".join(messages[i][1] for i in key)
+                    frames[key] = (b'{"type":"batch","events":[' + events + b"]}").decode()
+            
+            targets.append(connection)
+            sends.append(connection.send_text(frames[key]))
+        
+        # Send concurrently, so one slow client doesn't hold up the rest of the room
+        results = await asyncio.gather(*sends, return_exceptions=True)
         
         # Clean up dead connections
-        for dead_conn in dead_connections:
-            self.disconnect(dead_conn, room_id)
+        for connection, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting to connection: {str(result)}")
+                self.disconnect(connection, room_id)
     
-    async def broadcast_user_count(self, room_id: str):
+    async def broadcast_user_count(self, room_id: str, exclude: WebSocket | None = None):
         """
         Broadcast the current number of connected users to all room members.
         
+        Nothing is sent if the count is unchanged since the last broadcast
+        or nobody is left in the room.
+        
         Args:
             room_id: Room identifier
+            exclude: Optional WebSocket that already knows the count (e.g., new client)
             
         Example:
             await ws_manager.broadcast_user_count("abc123")
         """
         count = self.get_connection_count(room_id)
         
-        await self.broadcast(
-            room_id,
-            {
-                "type": "user_count",
-                "count": count
-            }
-        )
+        if count == 0 or self._last_user_count.get(room_id) == count:
+            return
+        
+        self._last_user_count[room_id] = count
+        
+        # Counts are per worker, so they aren't published to other workers
+        await self.broadcast(room_id, user_count_frame(count), exclude=exclude, local_only=True)
         
-        logger.debug(f"Broadcasted user count ({count}) to room {room_id}")
+        logger.debug("Broadcasted user count (%d) to room %s", count, room_id)
     
     def get_connection_count(self, room_id: str) -> int:
         """
@@ -166,10 +450,7 @@ class WebSocketManager:
             count = ws_manager.get_connection_count("abc123")
             print(f"Active users: {count}")
         """
-        if room_id not in self.active_connections:
-            return 0
-        
-        return len(self.active_connections[room_id])
+        return len(self.active_connections.get(room_id, ()))
     
     def get_all_rooms(self) -> List[str]:
         """
@@ -212,6 +493,415 @@ class WebSocketManager:
             )
         """
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(orjson.dumps(message).decode())
         except Exception as e:
-            logger.error(f"Error sending message to user: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error sending message to user: {str(e)}")
+    
+    async def open_document(self, room_id: str, code: str, version: int = 0) -> tuple[str, int]:
+        """
+        Get a room's current code, loading it if no client has it open.
+        
+        With Redis configured, the code and version shared by all workers
+        are loaded if the room has been edited recently.
+        
+        Args:
+            room_id: Room identifier
+            code: Code loaded from the database
+            version: Version of the code loaded from the database
+            
+        Returns:
+            tuple: (current code, version)
+            
+        Example:
+            code, version = await ws_manager.open_document("abc123", room.code, room.version)
+        """
+        if room_id not in self.documents:
+            shared = await self._load_document(room_id) if self.redis is not None else None
+            
+            # Another client may have opened it meanwhile
+            if room_id not in self.documents:
+                if shared is not None:
+                    self.documents[room_id], self.versions[room_id] = shared
+                else:
+                    # Buffered edits are newer than what's in the database
+                    pending_code = self.get_pending_code(room_id)
+                    if pending_code is not None:
+                        code = pending_code
+                        version = self.pending_versions.get(room_id, self._saving_versions.get(room_id, version))
+                    
+                    self.documents[room_id] = code
+                    self.versions[room_id] = version
+        
+        return self.documents[room_id], self.versions[room_id]
+    
+    async def apply_ops(self, room_id: str, ops: List[dict], version: int) -> int | None:
+        """
+        Apply text operations to a room's code and buffer the result.
+        
+        Ops must be based on the current version; ops based on an older
+        version are rejected and the client should resync.
+        
+        Args:
+            room_id: Room identifier
+            ops: Text operations (see apply_ops)
+            version: Version the ops were made against
+            
+        Returns:
+            int: New version, or None if the ops are stale
+            
+        Raises:
+            ValueError: If the ops don't apply to the current code
+            
+        Example:
+            version = await ws_manager.apply_ops("abc123", [{"retain": 5}, {"insert": "!"}], 3)
+        """
+        if room_id not in self.documents or version != self.versions[room_id]:
+            return None
+        
+        return await self.queue_code_update(
+            room_id,
+            apply_ops(self.documents[room_id], ops),
+            base_version=version
+        )
+    
+    async def queue_code_update(
+        self,
+        room_id: str,
+        code: str,
+        base_version: int | None = None
+    ) -> int | None:
+        """
+        Replace a room's code and schedule it to be saved.
+        
+        Updates arriving within CODE_FLUSH_DELAY of each other are coalesced,
+        so only the last one is written (last write wins), and are saved
+        together with the other rooms' updates in one transaction.
+        
+        Args:
+            room_id: Room identifier
+            code: New code content
+            base_version: Version the new code was derived from; if given and
+                the room has moved on (e.g. on another worker), nothing changes
+            
+        Returns:
+            int: New version of the room's code, or None if base_version is
+                stale or the code couldn't be stored in Redis
+            
+        Example:
+            version = await ws_manager.queue_code_update("abc123", "print('hello')")
+        """
+        if self.redis is None:
+            version = self.versions.get(room_id, 0) + 1
+        else:
+            try:
+                version = await self._commit(
+                    keys=[f"{DOCUMENT_PREFIX}{room_id}"],
+                    args=[
+                        "" if base_version is None else base_version,
+                        code,
+                        DOCUMENT_TTL,
+                        self.versions.get(room_id, 0)
+                    ]
+                )
+            except Exception as e:
+                logger.error(f"Error storing document for room {room_id}: {str(e)}")
+                return None
+            
+            if version is None:
+                # Another worker got there first; catch up with its edits
+                await self._reload_document(room_id)
+                return None
+        
+        # Only track rooms with connected clients, and don't go back to an
+        # older version if a newer edit was applied while this one was stored
+        if room_id in self.active_connections and version > self.versions.get(room_id, 0):
+            self.documents[room_id] = code
+            self.versions[room_id] = version
+        
+        self.pending_code[room_id] = code
+        self.pending_versions[room_id] = version
+        self._schedule_flush()
+        return version
+    
+    def get_pending_code(self, room_id: str) -> str | None:
+        """
+        Get buffered code for a room that hasn't been saved yet.
+        
+        Code in a batch that is being saved counts as unsaved until the
+        batch is committed.
+        
+        Args:
+            room_id: Room identifier
+            
+        Returns:
+            str: Latest unsaved code, or None if nothing is pending
+        """
+        code = self.pending_code.get(room_id)
+        return code if code is not None else self._saving.get(room_id)
+    
+    async def flush_all(self):
+        """
+        Save buffered code for every room in one batch.
+        
+        Runs every CODE_FLUSH_DELAY while edits are arriving, and on
+        shutdown. Only one batch is written at a time so updates land in
+        order; anything buffered meanwhile goes into the next batch. If
+        the batch fails, each room is saved on its own so one bad room
+        doesn't hold up the rest; rooms that still fail are retried after
+        the next delay, up to SAVE_ATTEMPTS times.
+        
+        Example:
+            await ws_manager.flush_all()
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        async with self._flush_lock:
+            if not self.pending_code or self.persist_code is None:
+                return
+            
+            batch, self.pending_code = self.pending_code, {}
+            versions, self.pending_versions = self.pending_versions, {}
+            self._saving, self._saving_versions = batch, versions
+            try:
+                failed = await self._save_batch(batch, versions)
+            finally:
+                self._saving, self._saving_versions = {}, {}
+            
+            for room_id in batch:
+                if room_id not in failed:
+                    self._failed_saves.pop(room_id, None)
+                    continue
+                
+                attempts = self._failed_saves.get(room_id, 0) + 1
+                if attempts >= SAVE_ATTEMPTS:
+                    self._failed_saves.pop(room_id, None)
+                    logger.error(f"Dropping unsaved code for room {room_id} after {attempts} attempts")
+                    continue
+                
+                # Retry with the next batch; edits buffered meanwhile are newer
+                self._failed_saves[room_id] = attempts
+                if room_id not in self.pending_code:
+                    self.pending_code[room_id] = batch[room_id]
+                    self.pending_versions[room_id] = versions[room_id]
+                self._schedule_flush()
+    
+    async def _save_batch(self, batch: Dict[str, str], versions: Dict[str, int]) -> Set[str]:
+        """
+        Save a batch of code, falling back to one room at a time if it fails.
+        
+        Args:
+            batch: Code per room ID
+            versions: Version of the code per room ID
+        
+        Returns:
+            set: IDs of the rooms that couldn't be saved
+        """
+        try:
+            await self.persist_code(batch, versions)
+            return set()
+        except Exception as e:
+            logger.error(f"Error saving code for {len(batch)} room(s): {str(e)}")
+        
+        if len(batch) == 1:
+            return set(batch)
+        
+        failed = set()
+        for room_id, code in batch.items():
+            try:
+                await self.persist_code({room_id: code}, {room_id: versions[room_id]})
+            except Exception as e:
+                logger.error(f"Error saving code for room {room_id}: {str(e)}")
+                failed.add(room_id)
+        return failed
+    
+    def _schedule_flush(self):
+        """Arm the flush timer unless one is already pending."""
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(CODE_FLUSH_DELAY, self._start_flush)
+    
+    def _start_flush(self):
+        """Timer callback: run flush_all as a background task."""
+        self._flush_handle = None
+        self._spawn(self.flush_all())
+    
+    def _spawn(self, coroutine: Awaitable[object]):
+        """Run a coroutine as a background task."""
+        task = asyncio.ensure_future(coroutine)
+        
+        # Keep a reference so the task isn't garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _publish(self, room_id: str, payload: bytes):
+        """
+        Publish a serialized message for other workers' connections.
+        
+        Args:
+            room_id: Room identifier
+            payload: Serialized JSON message
+        """
+        try:
+            await self.redis.publish(
+                f"{CHANNEL_PREFIX}{room_id}",
+                self.worker_id + b"\n" + payload
+            )
+        except Exception as e:
+            logger.error(f"Error publishing to room {room_id}: {str(e)}")
+    
+    async def _subscribe(self, room_id: str):
+        """Subscribe this worker to a room's channel and start the listener."""
+        if self._pubsub is None:
+            self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        
+        try:
+            await self._pubsub.subscribe(f"{CHANNEL_PREFIX}{room_id}")
+        except Exception as e:
+            logger.error(f"Error subscribing to room {room_id}: {str(e)}")
+            return
+        
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def _unsubscribe(self, room_id: str):
+        """Unsubscribe from a room's channel once no local clients remain."""
+        # A client may have rejoined before this task ran
+        if room_id in self.active_connections:
+            return
+        
+        try:
+            await self._pubsub.unsubscribe(f"{CHANNEL_PREFIX}{room_id}")
+        except Exception as e:
+            logger.error(f"Error unsubscribing from room {room_id}: {str(e)}")
+    
+    async def _listen(self):
+        """Deliver messages published by other workers to local connections."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading from Redis: {str(e)}")
+                await asyncio.sleep(1.0)
+                continue
+            
+            if message is None or message["type"] != "message":
+                continue
+            
+            # This worker's own messages were already sent locally
+            origin, _, payload = message["data"].partition(b"\n")
+            if origin == self.worker_id:
+                continue
+            
+            room_id = message["channel"].decode()[len(CHANNEL_PREFIX):]
+            try:
+                await self._apply_remote(room_id, payload)
+            except Exception as e:
+                logger.error(f"Error applying update to room {room_id}: {str(e)}")
+            
+            self._send_local(room_id, payload)
+    
+    async def _apply_remote(self, room_id: str, payload: bytes):
+        """
+        Apply an edit published by another worker to the room's document.
+        
+        Edits arrive in version order; if one is missing (or doesn't apply),
+        the document is reloaded from Redis. The other worker saves the code,
+        so anything this worker had buffered for the room is superseded.
+        
+        Args:
+            room_id: Room identifier
+            payload: Serialized JSON message
+        """
+        if room_id not in self.documents:
+            return
+        
+        message = orjson.loads(payload)
+        version = message.get("version")
+        if message.get("type") not in ("code_update", "op") or type(version) is not int:
+            return
+        
+        # Already applied (e.g. loaded from Redis after it was made)
+        if version <= self.versions[room_id]:
+            return
+        
+        self.pending_code.pop(room_id, None)
+        self.pending_versions.pop(room_id, None)
+        
+        if message["type"] == "code_update":
+            self.documents[room_id] = message["code"]
+            self.versions[room_id] = version
+            return
+        
+        if version == self.versions[room_id] + 1:
+            try:
+                self.documents[room_id] = apply_ops(self.documents[room_id], message["ops"])
+                self.versions[room_id] = version
+                return
+            except ValueError:
+                pass
+        
+        await self._reload_document(room_id)
+    
+    async def _load_document(self, room_id: str) -> tuple[str, int] | None:
+        """Read a room's shared code and version from Redis, if it has any."""
+        try:
+            code, version = await self.redis.hmget(
+                f"{DOCUMENT_PREFIX}{room_id}",
+                "code",
+                "version"
+            )
+        except Exception as e:
+            logger.error(f"Error loading document for room {room_id}: {str(e)}")
+            return None
+        
+        if version is None:
+            return None
+        
+        return code.decode(), int(version)
+    
+    async def _reload_document(self, room_id: str):
+        """Replace a room's local document with the shared one from Redis."""
+        shared = await self._load_document(room_id)
+        if room_id not in self.documents:
+            return
+        
+        # Without a shared document (not edited for DOCUMENT_TTL), the next
+        # edit continues from this worker's version
+        if shared is not None and shared[1] > self.versions[room_id]:
+            self.documents[room_id], self.versions[room_id] = shared
+            self.pending_code.pop(room_id, None)
+            self.pending_versions.pop(room_id, None)
+    
+    async def close(self):
+        """
+        Stop background tasks and release the Redis connection.
+        
+        Example:
+            await ws_manager.close()
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        for writer in self._writers.values():
+            writer.cancel()
+        self._writers.clear()
+        self._queues.clear()
+        
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        
+        if self.redis is not None:
+            await self.redis.aclose()
@@ -7,36 +7,68 @@ and includes all routers for the API endpoints.
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.routers import rooms, autocomplete, websocket
 from app.database import engine, Base
 import logging
+import os
 
-# Configure logging
+# Configure logging (per-connection events are logged at DEBUG)
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 # Initialize FastAPI application
 app = FastAPI(
     title="Pair Programming API",
     description="Real-time collaborative coding platform with AI autocomplete",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Configure CORS - Allow all origins for development
+# Configure CORS - comma-separated ALLOWED_ORIGINS, or all origins for development
+ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",")]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=ALLOWED_ORIGINS,  # In production, specify exact origins
+    allow_credentials=False,  # The API uses no cookies or auth headers
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["content-type", "authorization", "if-none-match"],
+    expose_headers=["ETag"],  # Lets clients read it for conditional GETs
 )
 
+# Create missing tables on startup; set AUTO_CREATE=0 when the schema is
+# managed separately so workers don't each run DDL on boot
+AUTO_CREATE = os.getenv("AUTO_CREATE", "1") == "1"
+
+@app.on_event("startup")
+async def create_tables():
+    """Create database tables on startup"""
+    if not AUTO_CREATE:
+        return
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("startup")
+async def start_autocomplete_workers():
+    """Start autocomplete worker processes if configured"""
+    autocomplete.start_executor()
+
+@app.on_event("shutdown")
+async def flush_pending_code():
+    """Save any buffered WebSocket code updates before exiting"""
+    await websocket.ws_manager.flush_all()
+    await websocket.ws_manager.close()
+
+@app.on_event("shutdown")
+async def stop_autocomplete_workers():
+    """Stop autocomplete worker processes"""
+    autocomplete.shutdown_executor()
+
 # Include routers
 app.include_router(rooms.router, prefix="/rooms", tags=["rooms"])
 app.include_router(autocomplete.router, prefix="/autocomplete", tags=["autocomplete"])
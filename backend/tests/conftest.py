@@ -0,0 +1,94 @@
+"""
+Shared test fixtures.
+
+Endpoint tests share one TestClient, so app startup runs once per session,
+and an in-memory SQLite database held on a single connection. Tables are
+created once and emptied after each test. Tests that don't touch the
+database can use async_client to make concurrent requests. Service tests
+use db, an async session on the same database.
+"""
+
+import asyncio
+import os
+
+# Tests use their own database; don't run DDL against the app's on startup
+os.environ.setdefault("AUTO_CREATE", "0")
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from main import app
+from app.database import Base, get_db
+from app.routers import websocket
+from app.services.room_service import RoomService
+
+# Test database; StaticPool keeps the one connection the in-memory database lives on
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+TestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+# Override dependency
+async def override_get_db():
+    async with TestingSessionLocal() as db:
+        yield db
+
+# Buffered WebSocket code is saved outside any request, so route it here too
+async def override_save_room_codes(codes, versions):
+    async with TestingSessionLocal() as db:
+        await RoomService(db).update_rooms_code(codes, versions=versions)
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def clear_tables():
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
+
+@pytest.fixture(scope="session")
+def app_client():
+    """Start the app once for the whole test session."""
+    app.dependency_overrides[get_db] = override_get_db
+    persist_code = websocket.ws_manager.persist_code
+    websocket.ws_manager.persist_code = override_save_room_codes
+    
+    # Entering the client keeps one event loop for all requests, which the
+    # shared database connection is bound to
+    with TestClient(app) as test_client:
+        test_client.portal.call(create_tables)
+        yield test_client
+    
+    app.dependency_overrides.clear()
+    websocket.ws_manager.persist_code = persist_code
+
+@pytest.fixture
+def client(app_client):
+    """Test client for the app, with the database emptied after each test."""
+    yield app_client
+    app_client.portal.call(clear_tables)
+
+@pytest_asyncio.fixture
+async def async_client():
+    """Async client calling the app in-process, for concurrent requests."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as test_client:
+        yield test_client
+
+@pytest_asyncio.fixture
+async def db():
+    """Database session for service tests, with the database emptied afterwards."""
+    await create_tables()
+    async with TestingSessionLocal() as session:
+        yield session
+    await clear_tables()
+
+def pytest_sessionfinish(session, exitstatus):
+    """Close the test database connection, whose worker thread blocks exit."""
+    asyncio.run(engine.dispose())
@@ -6,17 +6,20 @@ Tests cover:
 - Different code patterns
 - Error handling
 - Edge cases
+- Concurrent requests
+- Long lines kept out of the suggestion cache
 """
 
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
-from main import app
+from app.services.autocomplete_service import _match_line_cached
 
-client = TestClient(app)
+# Autocomplete needs no database, so these run against the app directly
+pytestmark = pytest.mark.asyncio
 
-def test_autocomplete_print_statement():
+async def test_autocomplete_print_statement(async_client):
     """Test autocomplete for print statement."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "print(",
@@ -33,9 +36,9 @@ def test_autocomplete_print_statement():
     assert "type" in data
     assert 0.0 <= data["confidence"] <= 1.0
 
-def test_autocomplete_function_definition():
+async def test_autocomplete_function_definition(async_client):
     """Test autocomplete for function definition."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "def hello():\n    ",
@@ -48,9 +51,9 @@ def test_autocomplete_function_definition():
     data = response.json()
     assert "suggestion" in data
 
-def test_autocomplete_invalid_cursor_position():
+async def test_autocomplete_invalid_cursor_position(async_client):
     """Test autocomplete with invalid cursor position."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "print('hello')",
@@ -61,9 +64,9 @@ def test_autocomplete_invalid_cursor_position():
     
     assert response.status_code == 400
 
-def test_autocomplete_empty_code():
+async def test_autocomplete_empty_code(async_client):
     """Test autocomplete with empty code."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "",
@@ -76,9 +79,9 @@ def test_autocomplete_empty_code():
     data = response.json()
     assert "suggestion" in data
 
-def test_autocomplete_javascript():
+async def test_autocomplete_javascript(async_client):
     """Test autocomplete for JavaScript."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "console.log(",
@@ -91,9 +94,9 @@ def test_autocomplete_javascript():
     data = response.json()
     assert "suggestion" in data
 
-def test_autocomplete_response_structure():
+async def test_autocomplete_response_structure(async_client):
     """Test that autocomplete response has correct structure."""
-    response = client.post(
+    response = await async_client.post(
         "/autocomplete",
         json={
             "code": "x = ",
@@ -113,4 +116,35 @@ def test_autocomplete_response_structure():
     # Check types
     assert isinstance(data["suggestion"], str)
     assert isinstance(data["confidence"], float)
-    assert isinstance(data["type"], str)
\ No newline at end of file
+    assert isinstance(data["type"], str)
+
+async def test_autocomplete_concurrent_requests(async_client):
+    """Test that concurrent requests each get their own suggestion."""
+    requests = [
+        {"code": "print(", "cursorPosition": 6, "language": "python"},
+        {"code": "for i in ", "cursorPosition": 9, "language": "python"},
+        {"code": "console.log(", "cursorPosition": 12, "language": "javascript"},
+        {"code": "", "cursorPosition": 0, "language": "python"},
+    ]
+    
+    responses = await asyncio.gather(*(
+        async_client.post("/autocomplete", json=request) for request in requests
+    ))
+    
+    assert [response.status_code for response in responses] == [200] * len(requests)
+    assert responses[0].json()["type"] == "completion"
+    assert responses[1].json()["suggestion"].startswith("range(10):")
+
+async def test_autocomplete_long_line_not_cached(async_client):
+    """Test that very long lines are matched without being cached."""
+    code = "x = 1; " * 1000 + "print("
+    cache_size = _match_line_cached.cache_info().currsize
+    
+    response = await async_client.post(
+        "/autocomplete",
+        json={"code": code, "cursorPosition": len(code), "language": "python"}
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["type"] == "completion"
+    assert _match_line_cached.cache_info().currsize == cache_size
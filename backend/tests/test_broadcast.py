@@ -0,0 +1,163 @@
+"""
+Unit tests for batched WebSocket broadcasts.
+
+Tests cover:
+- Single messages sent unwrapped
+- Messages within the batch interval sent as one batch frame
+- Superseded code updates dropped from a batch
+- Buffered code for several rooms saved in one batch
+- Failed saves kept for the next save, behind newer edits
+- Rooms that keep failing to save dropped without blocking other rooms
+- Code being saved still loaded by a client reopening the room
+"""
+
+import asyncio
+import orjson
+import pytest
+from app.services.websocket_manager import BROADCAST_INTERVAL, CODE_FLUSH_DELAY, SAVE_ATTEMPTS, WebSocketManager
+
+class FakeWebSocket:
+    """Records text frames sent to it."""
+    
+    def __init__(self):
+        self.frames = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, data):
+        self.frames.append(orjson.loads(data))
+
+async def connected_room(count):
+    """Create a manager with count fake connections in room1."""
+    manager = WebSocketManager()
+    sockets = [FakeWebSocket() for _ in range(count)]
+    for websocket in sockets:
+        await manager.connect(websocket, "room1")
+    return manager, sockets
+
+@pytest.mark.asyncio
+async def test_single_message_not_batched():
+    """Test that a lone message is sent as is."""
+    manager, (sender, receiver) = await connected_room(2)
+    
+    await manager.broadcast("room1", {"type": "op", "ops": []}, exclude=sender)
+    await asyncio.sleep(BROADCAST_INTERVAL * 5)
+    
+    assert sender.frames == []
+    assert receiver.frames == [{"type": "op", "ops": []}]
+    
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_messages_batched_and_coalesced():
+    """Test that queued messages share a frame and stale code updates are dropped."""
+    manager, (sender, receiver) = await connected_room(2)
+    
+    await manager.broadcast("room1", {"type": "code_update", "code": "a"}, exclude=sender)
+    await manager.broadcast("room1", {"type": "code_update", "code": "ab"}, exclude=sender)
+    await manager.broadcast("room1", {"type": "user_count", "count": 2})
+    await asyncio.sleep(BROADCAST_INTERVAL * 5)
+    
+    assert sender.frames == [{"type": "user_count", "count": 2}]
+    assert receiver.frames == [{
+        "type": "batch",
+        "events": [
+            {"type": "code_update", "code": "ab"},
+            {"type": "user_count", "count": 2}
+        ]
+    }]
+    
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_code_updates_saved_in_one_batch():
+    """Test that buffered code for all rooms is saved together."""
+    batches = []
+    
+    async def persist_code(codes, versions):
+        batches.append(codes)
+    
+    manager = WebSocketManager(persist_code=persist_code)
+    await manager.queue_code_update("room1", "a")
+    await manager.queue_code_update("room2", "b")
+    await manager.queue_code_update("room1", "ab")
+    await asyncio.sleep(CODE_FLUSH_DELAY * 2)
+    
+    assert batches == [{"room1": "ab", "room2": "b"}]
+    assert manager.pending_code == {}
+    
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_failed_save_retried():
+    """Test that code that fails to save is kept, and newer edits win."""
+    batches = []
+    
+    async def persist_code(codes, versions):
+        batches.append(codes)
+        if len(batches) == 1:
+            await manager.queue_code_update("room1", "newer")
+            raise RuntimeError("database unavailable")
+    
+    manager = WebSocketManager(persist_code=persist_code)
+    await manager.queue_code_update("room1", "a")
+    await manager.flush_all()
+    
+    assert manager.pending_code == {"room1": "newer"}
+    
+    await asyncio.sleep(CODE_FLUSH_DELAY * 2)
+    
+    assert batches[-1] == {"room1": "newer"}
+    assert manager.pending_code == {}
+    
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_failing_room_does_not_block_others():
+    """Test that a room that can't be saved is dropped without holding up others."""
+    saved = {}
+    
+    async def persist_code(codes, versions):
+        if "bad" in codes:
+            raise ValueError("invalid code")
+        saved.update(codes)
+    
+    manager = WebSocketManager(persist_code=persist_code)
+    await manager.queue_code_update("bad", "\x00")
+    await manager.queue_code_update("good", "x")
+    await manager.flush_all()
+    
+    assert saved == {"good": "x"}
+    assert manager.pending_code == {"bad": "\x00"}
+    
+    for _ in range(SAVE_ATTEMPTS - 1):
+        await manager.flush_all()
+    
+    assert saved == {"good": "x"}
+    assert manager.pending_code == {}
+    
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_reopen_during_save_sees_unsaved_code():
+    """Test that a room reopened while its code is being saved gets that code."""
+    saving = asyncio.Event()
+    release = asyncio.Event()
+    
+    async def persist_code(codes, versions):
+        saving.set()
+        await release.wait()
+    
+    manager = WebSocketManager(persist_code=persist_code)
+    await manager.queue_code_update("room1", "edited")
+    flush = asyncio.create_task(manager.flush_all())
+    await saving.wait()
+    
+    assert await manager.open_document("room1", "original") == ("edited", 1)
+    
+    release.set()
+    await flush
+    assert manager.get_pending_code("room1") is None
+    
+    await manager.close()
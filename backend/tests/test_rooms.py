@@ -8,39 +8,10 @@ Tests cover:
 - Error handling
 """
 
+import re
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app
-from app.database import Base, get_db
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Override dependency
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-# Create test client
-client = TestClient(app)
-
-@pytest.fixture(autouse=True)
-def setup_database():
-    """Setup and teardown test database for each test."""
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
-
-def test_create_room():
+def test_create_room(client):
     """Test successful room creation."""
     response = client.post("/rooms", json={"language": "python"})
     
@@ -52,7 +23,7 @@ def test_create_room():
     assert "code" in data
     assert "created_at" in data
 
-def test_create_room_default_language():
+def test_create_room_default_language(client):
     """Test room creation with default language."""
     response = client.post("/rooms", json={})
     
@@ -60,7 +31,7 @@ def test_create_room_default_language():
     data = response.json()
     assert data["language"] == "python"
 
-def test_get_room():
+def test_get_room(client):
     """Test retrieving an existing room."""
     # Create room first
     create_response = client.post("/rooms", json={"language": "python"})
@@ -73,14 +44,14 @@ def test_get_room():
     data = response.json()
     assert data["roomId"] == room_id
 
-def test_get_nonexistent_room():
+def test_get_nonexistent_room(client):
     """Test retrieving a room that doesn't exist."""
     response = client.get("/rooms/nonexistent")
     
     assert response.status_code == 404
     assert "not found" in response.json()["detail"].lower()
 
-def test_delete_room():
+def test_delete_room(client):
     """Test deleting an existing room."""
     # Create room first
     create_response = client.post("/rooms", json={"language": "python"})
@@ -95,8 +66,52 @@ def test_delete_room():
     get_response = client.get(f"/rooms/{room_id}")
     assert get_response.status_code == 404
 
-def test_delete_nonexistent_room():
+def test_delete_nonexistent_room(client):
     """Test deleting a room that doesn't exist."""
     response = client.delete("/rooms/nonexistent")
     
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_get_room_not_modified(client):
+    """Test conditional GET with the room's ETag."""
+    create_response = client.post("/rooms", json={"language": "python"})
+    room_id = create_response.json()["roomId"]
+    
+    response = client.get(f"/rooms/{room_id}")
+    etag = response.headers["etag"]
+    
+    # Unchanged room: 304 without a body
+    cached_response = client.get(f"/rooms/{room_id}", headers={"If-None-Match": etag})
+    assert cached_response.status_code == 304
+    assert cached_response.content == b""
+    
+    # Stale ETag: full response
+    stale_response = client.get(f"/rooms/{room_id}", headers={"If-None-Match": 'W/"stale"'})
+    assert stale_response.status_code == 200
+    assert stale_response.headers["etag"] == etag
+
+def test_get_room_etag_with_unusual_language(client):
+    """Test that the ETag stays a valid header for any language name."""
+    create_response = client.post("/rooms", json={"language": '日本語 "quoted"'})
+    room_id = create_response.json()["roomId"]
+    
+    response = client.get(f"/rooms/{room_id}")
+    
+    assert response.status_code == 200
+    assert response.json()["language"] == '日本語 "quoted"'
+    assert re.fullmatch(r'W/"[0-9.]+-[0-9a-f]{8}"', response.headers["etag"])
+
+def test_etag_available_cross_origin(client):
+    """Test that other origins can read the ETag and send If-None-Match."""
+    create_response = client.post("/rooms", json={"language": "python"})
+    room_id = create_response.json()["roomId"]
+    
+    response = client.get(f"/rooms/{room_id}", headers={"Origin": "http://example.com"})
+    assert "etag" in response.headers["access-control-expose-headers"].lower()
+    
+    preflight = client.options(f"/rooms/{room_id}", headers={
+        "Origin": "http://example.com",
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "if-none-match"
+    })
+    assert preflight.status_code == 200
\ No newline at end of file
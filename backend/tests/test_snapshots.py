@@ -0,0 +1,166 @@
+"""
+Unit tests for snapshot delta encoding and storage.
+
+Tests cover:
+- Round-tripping edits through encode_delta/apply_delta
+- Insertions, deletions and replacements
+- Edge cases (empty and identical code)
+- Compression of large payloads
+- Reconstructing code across full snapshot boundaries
+- Throttled snapshots amended in place
+- Rolled-back batches not leaving stale delta bases
+- Broken delta chains
+- Versioned code not overwriting newer code
+"""
+
+import pytest
+from sqlalchemy import func, insert, select
+from app.models import CodeSnapshot
+from app.services import snapshot_service
+from app.services.room_service import RoomService
+from app.services.snapshot_service import (
+    FULL_SNAPSHOT_INTERVAL,
+    SnapshotService,
+    encode_delta,
+    apply_delta,
+    encode_full,
+    decode_full
+)
+
+@pytest.mark.parametrize("base, code", [
+    ("print('hi')", "print('hello')"),
+    ("def f():\n    pass\n", "def f():\n    return 1\n"),
+    ("abc", "abcabc"),
+    ("aaaa", "aa"),
+    ("", "x = 1"),
+    ("x = 1", ""),
+    ("same", "same"),
+])
+def test_delta_round_trip(base, code):
+    """Test that applying a delta reproduces the new code."""
+    delta = encode_delta(base, code)
+    
+    assert apply_delta(base, delta) == code
+
+def test_delta_only_stores_changed_text():
+    """Test that a small edit to a large file produces a small delta."""
+    base = "x = 1\n" * 1000
+    code = base[:3000] + "y = 2\n" + base[3000:]
+    
+    delta = encode_delta(base, code)
+    
+    assert len(delta) < 50
+    assert apply_delta(base, delta) == code
+
+@pytest.mark.parametrize("code", ["", "x", "x = 1\n" * 1000])
+def test_full_round_trip(code):
+    """Test that full snapshots decode to the original code."""
+    assert decode_full(encode_full(code)) == code
+
+def test_large_payloads_compressed():
+    """Test that large full snapshots and deltas are stored compressed."""
+    code = "print('hello')\n" * 1000
+    
+    assert len(encode_full(code)) < len(code) // 10
+    
+    delta = encode_delta("", code)
+    assert len(delta) < len(code) // 10
+    assert apply_delta("", delta) == code
+
+async def count_snapshots(db, room_id):
+    """Number of snapshot rows stored for a room."""
+    result = await db.execute(
+        select(func.count()).select_from(CodeSnapshot).where(CodeSnapshot.room_id == room_id)
+    )
+    return result.scalar_one()
+
+@pytest.mark.asyncio
+async def test_reconstruct_across_full_snapshots(db, monkeypatch):
+    """Test that every snapshot reconstructs, across full snapshot boundaries."""
+    monkeypatch.setattr(snapshot_service, "SNAPSHOT_MIN_INTERVAL", 0)
+    room = await RoomService(db).create_room()
+    service = SnapshotService(db)
+    
+    codes = [f"x = {i}\n" * (i % 7 + 1) for i in range(FULL_SNAPSHOT_INTERVAL + 5)]
+    ids = [await service.append(room.id, code) for code in codes]
+    await db.commit()
+    
+    snapshots = {snapshot.id: snapshot for snapshot in await RoomService(db).list_snapshots(room.id, limit=100)}
+    assert [i for i, snapshot_id in enumerate(ids) if snapshots[snapshot_id].is_full] == [0, FULL_SNAPSHOT_INTERVAL]
+    
+    for snapshot_id, code in zip(ids, codes):
+        assert await service.get_code(snapshot_id) == code
+    
+    SnapshotService.discard_head(room.id)
+
+@pytest.mark.asyncio
+async def test_snapshot_amended_within_interval(db):
+    """Test that changes within SNAPSHOT_MIN_INTERVAL update the latest snapshot."""
+    room = await RoomService(db).create_room()
+    service = SnapshotService(db)
+    
+    first_id = await service.append(room.id, "x = 1")
+    second_id = await service.append(room.id, "x = 2")
+    await db.commit()
+    
+    assert second_id == first_id
+    assert await count_snapshots(db, room.id) == 1
+    assert await service.get_code(first_id) == "x = 2"
+    
+    SnapshotService.discard_head(room.id)
+
+@pytest.mark.asyncio
+async def test_failed_batch_discards_snapshot_heads(db, monkeypatch):
+    """Test that a batch failing part-way leaves no stale snapshot to build on."""
+    room_service = RoomService(db)
+    first_id = (await room_service.create_room()).id
+    second_id = (await room_service.create_room()).id
+    append = SnapshotService.append
+    
+    async def failing_append(self, room_id, code, user_identifier=None):
+        if room_id == second_id:
+            raise RuntimeError("insert failed")
+        return await append(self, room_id, code, user_identifier)
+    
+    monkeypatch.setattr(SnapshotService, "append", failing_append)
+    with pytest.raises(RuntimeError):
+        await room_service.update_rooms_code({first_id: "x = 1", second_id: "y = 1"})
+    monkeypatch.undo()
+    
+    assert await count_snapshots(db, first_id) == 0
+    
+    assert await room_service.update_rooms_code({first_id: "x = 2"}) == 1
+    snapshots = await room_service.list_snapshots(first_id)
+    
+    assert len(snapshots) == 1
+    assert snapshots[0].is_full
+    assert await SnapshotService(db).get_code(snapshots[0].id) == "x = 2"
+    
+    SnapshotService.discard_head(first_id)
+
+@pytest.mark.asyncio
+async def test_broken_chain_returns_none(db):
+    """Test that a delta whose base is missing or not earlier isn't followed."""
+    room = await RoomService(db).create_room()
+    
+    for base_id in (None, 1000):
+        result = await db.execute(
+            insert(CodeSnapshot)
+            .values(room_id=room.id, is_full=False, base_id=base_id, payload=encode_delta("", "x"))
+            .returning(CodeSnapshot.id)
+        )
+        assert await SnapshotService(db).get_code(result.scalar_one()) is None
+
+@pytest.mark.asyncio
+async def test_older_version_not_saved_over_newer(db):
+    """Test that code with an older version doesn't replace newer code."""
+    room_service = RoomService(db)
+    room_id = (await room_service.create_room()).id
+    
+    assert await room_service.update_rooms_code({room_id: "x = 2"}, versions={room_id: 2}) == 1
+    assert await room_service.update_rooms_code({room_id: "x = 1"}, versions={room_id: 1}) == 0
+    
+    room = await room_service.get_room(room_id)
+    assert (room.code, room.version) == ("x = 2", 2)
+    
+    SnapshotService.discard_head(room_id)
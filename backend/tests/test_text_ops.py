@@ -0,0 +1,124 @@
+"""
+Unit tests for incremental text operations.
+
+Tests cover:
+- Applying retain/insert/delete ops
+- Rejecting malformed ops and ops past the end of the code
+- Rejecting stale ops based on an old version
+- Sharing versions and edits between workers through Redis
+- Continuing from the saved version when a room is reopened
+"""
+
+import orjson
+import pytest
+from app.services.websocket_manager import WebSocketManager, apply_ops
+
+class FakeRedis:
+    """Holds shared documents in memory, running the commit script in Python."""
+    
+    def __init__(self):
+        self.documents = {}
+    
+    def register_script(self, script):
+        async def commit(keys, args):
+            expected, code, ttl, fallback_version = args
+            version = self.documents.get(keys[0], ("", fallback_version))[1]
+            if expected != "" and int(expected) != version:
+                return None
+            self.documents[keys[0]] = (code, version + 1)
+            return version + 1
+        return commit
+    
+    async def hmget(self, key, *fields):
+        if key not in self.documents:
+            return [None, None]
+        code, version = self.documents[key]
+        return [code.encode(), str(version).encode()]
+    
+    async def aclose(self):
+        pass
+
+async def worker(redis, code="x = 1"):
+    """Create a manager with room1 open, as one of several workers."""
+    manager = WebSocketManager(redis=redis)
+    manager.active_connections["room1"] = set()
+    await manager.open_document("room1", code)
+    return manager
+
+@pytest.mark.parametrize("code, ops, expected", [
+    ("print('hi')", [{"retain": 7}, {"delete": 2}, {"insert": "bye"}], "print('bye')"),
+    ("x = 1", [{"insert": "# set x\n"}], "# set x\nx = 1"),
+    ("x = 1", [{"retain": 4}, {"delete": 1}, {"insert": "2"}], "x = 2"),
+    ("x = 1", [{"delete": 5}], ""),
+    ("x = 1", [], "x = 1"),
+])
+def test_apply_ops(code, ops, expected):
+    """Test that ops edit the code as described."""
+    assert apply_ops(code, ops) == expected
+
+@pytest.mark.parametrize("ops", [
+    [{"retain": 10}],
+    [{"delete": -1}],
+    [{"retain": True}],
+    [{"insert": 1}],
+    [{}],
+    5,
+    {"insert": "a"},
+    None,
+])
+def test_apply_invalid_ops(ops):
+    """Test that malformed ops are rejected."""
+    with pytest.raises(ValueError):
+        apply_ops("x = 1", ops)
+
+@pytest.mark.asyncio
+async def test_stale_ops_rejected():
+    """Test that ops based on an old version are not applied."""
+    manager = WebSocketManager()
+    manager.active_connections["room1"] = set()
+    await manager.open_document("room1", "x = 1")
+    
+    assert await manager.apply_ops("room1", [{"insert": "a"}], 0) == 1
+    assert await manager.apply_ops("room1", [{"insert": "b"}], 0) is None
+    assert manager.documents["room1"] == "ax = 1"
+
+@pytest.mark.asyncio
+async def test_remote_ops_applied_in_order():
+    """Test that ops accepted by another worker update this worker's document."""
+    redis = FakeRedis()
+    first, second = await worker(redis), await worker(redis)
+    
+    assert await first.apply_ops("room1", [{"insert": "a"}], 0) == 1
+    await second._apply_remote("room1", orjson.dumps({"type": "op", "version": 1, "ops": [{"insert": "a"}]}))
+    
+    assert second.documents["room1"] == "ax = 1"
+    assert await second.apply_ops("room1", [{"insert": "b"}], 0) is None
+    assert await second.apply_ops("room1", [{"insert": "b"}], 1) == 2
+    
+    # A worker opening the room later starts from the shared document
+    third = await worker(redis, code="stale")
+    assert await third.open_document("room1", "stale") == ("bax = 1", 2)
+
+@pytest.mark.asyncio
+async def test_concurrent_ops_on_two_workers():
+    """Test that only one of two workers accepts ops against the same version."""
+    redis = FakeRedis()
+    first, second = await worker(redis), await worker(redis)
+    
+    assert await first.apply_ops("room1", [{"insert": "a"}], 0) == 1
+    
+    # The second worker hasn't seen the first edit yet; it catches up instead
+    assert await second.apply_ops("room1", [{"insert": "b"}], 0) is None
+    assert await second.open_document("room1", "x = 1") == ("ax = 1", 1)
+    assert second.get_pending_code("room1") is None
+
+@pytest.mark.parametrize("redis", [None, FakeRedis()])
+@pytest.mark.asyncio
+async def test_versions_continue_from_saved_version(redis):
+    """Test that a reopened room's versions continue from the saved version."""
+    manager = WebSocketManager(redis=redis)
+    manager.active_connections["room1"] = set()
+    
+    assert await manager.open_document("room1", "x = 1", 5) == ("x = 1", 5)
+    assert await manager.apply_ops("room1", [{"insert": "a"}], 5) == 6
+    assert manager.pending_versions == {"room1": 6}
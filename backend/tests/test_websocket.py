@@ -0,0 +1,91 @@
+"""
+Unit tests for the WebSocket endpoint.
+
+Tests cover:
+- Init message on connect
+- Rejecting connections to missing rooms
+- Ops acknowledged to the sender and broadcast to other clients
+- Resyncing clients whose ops or code updates are stale or malformed
+"""
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+def create_room(client):
+    """Create a Python room and return its ID."""
+    return client.post("/rooms", json={"language": "python"}).json()["roomId"]
+
+def test_connect_sends_init(client):
+    """Test that a new connection gets the room's state in one message."""
+    room_id = create_room(client)
+    code = client.get(f"/rooms/{room_id}").json()["code"]
+    
+    with client.websocket_connect(f"/ws/{room_id}") as websocket:
+        message = websocket.receive_json()
+    
+    assert message == {
+        "type": "init",
+        "code": code,
+        "language": "python",
+        "version": 0,
+        "user_count": 1
+    }
+
+def test_connect_to_missing_room(client):
+    """Test that connections to a nonexistent room are closed."""
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect("/ws/missing1") as websocket:
+            websocket.receive_json()
+    
+    assert exc_info.value.code == 4004
+
+def test_op_acked_and_broadcast(client):
+    """Test that an accepted op is acked to the sender and sent to others."""
+    room_id = create_room(client)
+    
+    with client.websocket_connect(f"/ws/{room_id}") as receiver:
+        init = receiver.receive_json()
+        
+        with client.websocket_connect(f"/ws/{room_id}") as sender:
+            sender.receive_json()
+            assert receiver.receive_json() == {"type": "user_count", "count": 2}
+            
+            ops = [{"insert": "# hi\n"}]
+            sender.send_json({"type": "op", "version": 0, "ops": ops})
+            
+            assert sender.receive_json() == {"type": "ack", "version": 1}
+            assert receiver.receive_json() == {"type": "op", "version": 1, "ops": ops}
+            
+            # A new client starts from the edited code
+            with client.websocket_connect(f"/ws/{room_id}") as joiner:
+                message = joiner.receive_json()
+    
+    assert message["code"] == "# hi\n" + init["code"]
+    assert message["version"] == 1
+
+@pytest.mark.parametrize("message", [
+    {"type": "op", "version": 0, "ops": [{"insert": "b"}]},
+    {"type": "op", "version": 1, "ops": [{"retain": 10000}]},
+    {"type": "op", "version": 1, "ops": 5},
+    {"type": "code_update", "code": 5},
+])
+def test_rejected_op_resyncs_sender(client, message):
+    """Test that a stale or malformed edit is answered with the current code."""
+    room_id = create_room(client)
+    
+    with client.websocket_connect(f"/ws/{room_id}") as websocket:
+        code = websocket.receive_json()["code"]
+        websocket.send_json({"type": "op", "version": 0, "ops": [{"insert": "a"}]})
+        assert websocket.receive_json() == {"type": "ack", "version": 1}
+        
+        websocket.send_json(message)
+        
+        assert websocket.receive_json() == {
+            "type": "code_update",
+            "code": "a" + code,
+            "version": 1
+        }
+        
+        # The connection is still usable
+        websocket.send_json({"type": "op", "version": 1, "ops": [{"insert": "b"}]})
+        assert websocket.receive_json() == {"type": "ack", "version": 2}